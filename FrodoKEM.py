@@ -1,6 +1,8 @@
 import os
 import hashlib
-from sage.all import Matrix, ZZ
+from matrix_cache import MatrixCache
+from samplers import BinomialSampler
+from frodo_engine import get_engine, entries, to_u16
 
 n = 40            
 nbar = 8            
@@ -8,41 +10,45 @@ q = 2**15
 mu_bytes = 16        
 seed_bytes = 16     
 
-def sample_error_matrix(rows, cols):
-    def sample():
-        return sum((1 if os.urandom(1)[0] & (1 << i) else 0) - (1 if os.urandom(1)[0] & (1 << i) else 0) for i in range(6))
-    return Matrix(ZZ, rows, cols, [sample() for _ in range(rows * cols)])
+error_sampler = BinomialSampler(6)
+
+def sample_error_matrix(rows, cols, engine=None, seed=None):
+    return get_engine(engine).matrix(rows, cols, error_sampler.sample(rows * cols, seed))
 
 
 def shake128(input_bytes, out_len):
     return hashlib.shake_128(input_bytes).digest(out_len)
 
 
-def generate_A(seedA):
-    buf = shake128(seedA, 2 * n * n)
-    vals = [int.from_bytes(buf[2*i:2*i+2], 'little') & (q-1) for i in range(n*n)]
-    return Matrix(ZZ, n, n, vals)
+A_cache = MatrixCache()
+
+def generate_A(seedA, engine=None):
+    # Cached per (seedA, engine); the returned matrix is read-only.
+    eng = get_engine(engine)
+    def expand():
+        buf = shake128(seedA, 2 * n * n)
+        return eng.from_u16(buf, n, n, mask=q-1)
+    return A_cache.get_or_compute((bytes(seedA), eng.name), expand)
 
 
 def encode_matrix(M):
-    return b"".join(int(x).to_bytes(2, 'little') for x in M.list())
+    return to_u16(M)
 
 
-def decode_matrix(bstr, rows, cols):
-    vals = [int.from_bytes(bstr[2*i:2*i+2], 'little') for i in range(rows*cols)]
-    return Matrix(ZZ, rows, cols, vals)
+def decode_matrix(bstr, rows, cols, engine=None):
+    return get_engine(engine).from_u16(bstr, rows, cols)
 
 
-def encode_mu(mu):
+def encode_mu(mu, engine=None):
     bits = [(mu[i//8] >> (i%8)) & 1 for i in range(mu_bytes*8)]
     vals = [(bits[2*i] | (bits[2*i+1] << 1)) for i in range(nbar*nbar)]
     step = q // 4
-    return Matrix(ZZ, nbar, nbar, [v * step for v in vals])
+    return get_engine(engine).matrix(nbar, nbar, [v * step for v in vals])
 
 
 def decode_mu(M):
     step = q // 4
-    flat = M.list()
+    flat = entries(M)
     two_bits = [int(round(v / step)) % 4 for v in flat]
     bits = []
     for tb in two_bits:
@@ -53,46 +59,91 @@ def decode_mu(M):
         mu_rec[i//8] |= (b << (i%8))
     return bytes(mu_rec)
 
-def frodokem_keygen():
+def frodokem_keygen(engine=None):
+    eng = get_engine(engine)
     seedA = os.urandom(seed_bytes)
-    A = generate_A(seedA)
-    S = sample_error_matrix(n, nbar)
-    E = sample_error_matrix(n, nbar)
-    B = (A * S + E).apply_map(lambda x: x % q)
+    A = generate_A(seedA, eng.name)
+    S = sample_error_matrix(n, nbar, eng.name)
+    E = sample_error_matrix(n, nbar, eng.name)
+    B = eng.mod(eng.mul(A, S) + E, q)
     pk = seedA + encode_matrix(B)
     sk = (S, B)
     return pk, sk
 
 
-def frodokem_encapsulate(pk):
+def frodokem_encapsulate(pk, engine=None):
+    eng = get_engine(engine)
     seedA = pk[:seed_bytes]
-    B = decode_matrix(pk[seed_bytes:], n, nbar)
+    B = decode_matrix(memoryview(pk)[seed_bytes:], n, nbar, eng.name)
     mu = os.urandom(mu_bytes)
-    Sp = sample_error_matrix(nbar, n)
-    Ep = sample_error_matrix(nbar, n)
-    Epp = sample_error_matrix(nbar, nbar)
-    A = generate_A(seedA)
-    C1 = (Sp * A + Ep).apply_map(lambda x: x % q)
-    V = (Sp * B + Epp).apply_map(lambda x: x % q)
-    MU = encode_mu(mu)
-    C2 = (V[:, :nbar] + MU).apply_map(lambda x: x % q)
+    Sp = sample_error_matrix(nbar, n, eng.name)
+    Ep = sample_error_matrix(nbar, n, eng.name)
+    Epp = sample_error_matrix(nbar, nbar, eng.name)
+    A = generate_A(seedA, eng.name)
+    C1 = eng.mod(eng.mul(Sp, A) + Ep, q)
+    V = eng.mod(eng.mul(Sp, B) + Epp, q)
+    MU = encode_mu(mu, eng.name)
+    C2 = eng.mod(V[:, :nbar] + MU, q)
     ct = encode_matrix(C1) + encode_matrix(C2)
     ss = hashlib.sha3_256(mu + ct).digest()[:mu_bytes]
     return ct, ss, mu
 
 
-def frodokem_decapsulate(pk, sk, ct):
+def frodokem_decapsulate(pk, sk, ct, engine=None):
+    eng = get_engine(engine)
     seedA = pk[:seed_bytes]
-    S, _ = sk
+    S = eng.convert(sk[0])
     len_c1 = 2 * nbar * n
-    C1 = decode_matrix(ct[:len_c1], nbar, n)
-    C2 = decode_matrix(ct[len_c1:], nbar, nbar)
-    Vp = (C1 * S).apply_map(lambda x: x % q)
-    Mp = (C2 - Vp).apply_map(lambda x: x % q)
+    C1 = decode_matrix(memoryview(ct)[:len_c1], nbar, n, eng.name)
+    C2 = decode_matrix(memoryview(ct)[len_c1:], nbar, nbar, eng.name)
+    Vp = eng.mod(eng.mul(C1, S), q)
+    Mp = eng.mod(C2 - Vp, q)
     mu_rec = decode_mu(Mp)
     ss = hashlib.sha3_256(mu_rec + ct).digest()[:mu_bytes]
     return mu_rec, ss
 
+def frodokem_encapsulate_batch(pk, count, engine=None):
+    # Parse pk and expand A once, then encapsulate `count` times with one
+    # stacked (count*nbar) x n product per matrix.
+    if count == 0:
+        return []
+    eng = get_engine(engine)
+    seedA = pk[:seed_bytes]
+    B = decode_matrix(memoryview(pk)[seed_bytes:], n, nbar, eng.name)
+    A = generate_A(seedA, eng.name)
+    mus = [os.urandom(mu_bytes) for _ in range(count)]
+    Sp = sample_error_matrix(count * nbar, n, eng.name)
+    Ep = sample_error_matrix(count * nbar, n, eng.name)
+    Epp = sample_error_matrix(count * nbar, nbar, eng.name)
+    C1 = eng.mod(eng.mul(Sp, A) + Ep, q)
+    V = eng.mod(eng.mul(Sp, B) + Epp, q)
+    MU = eng.stack([encode_mu(mu, eng.name) for mu in mus])
+    C2 = eng.mod(V[:, :nbar] + MU, q)
+    c1_bytes, c2_bytes = encode_matrix(C1), encode_matrix(C2)
+    len_c1, len_c2 = 2 * nbar * n, 2 * nbar * nbar
+    results = []
+    for k, mu in enumerate(mus):
+        ct = c1_bytes[k*len_c1:(k+1)*len_c1] + c2_bytes[k*len_c2:(k+1)*len_c2]
+        ss = hashlib.sha3_256(mu + ct).digest()[:mu_bytes]
+        results.append((ct, ss, mu))
+    return results
+
+
+def frodokem_decapsulate_batch(pk, sk, cts, engine=None):
+    eng = get_engine(engine)
+    S = eng.convert(sk[0])
+    len_c1 = 2 * nbar * n
+    C1 = decode_matrix(b"".join(ct[:len_c1] for ct in cts), len(cts) * nbar, n, eng.name)
+    C2 = decode_matrix(b"".join(ct[len_c1:] for ct in cts), len(cts) * nbar, nbar, eng.name)
+    Vp = eng.mod(eng.mul(C1, S), q)
+    Mp = eng.mod(C2 - Vp, q)
+    results = []
+    for k, ct in enumerate(cts):
+        mu_rec = decode_mu(Mp[k*nbar:(k+1)*nbar, :])
+        ss = hashlib.sha3_256(mu_rec + ct).digest()[:mu_bytes]
+        results.append((mu_rec, ss))
+    return results
+
 def example():
     pk, sk = frodokem_keygen()
     ct, ss1, mu = frodokem_encapsulate(pk)
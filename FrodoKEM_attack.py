@@ -1,8 +1,10 @@
 import os
 import hashlib
-from sage.all import Matrix, ZZ
-from sage.all import *
-import random
+from samplers import UniformSampler
+from matrix_cache import MatrixCache
+from estimator import estimate_frodo, enforce
+from frodo_recovery import recover_frodo_secret
+from frodo_engine import get_engine, entries, to_u16, SageRequired
 
 n = 120
 m = n+n//2      
@@ -11,36 +13,41 @@ q = 2**15
 mu_bytes = 16
 seed_bytes = 16
 
-def sample(e):
-    return random.randint(-e, e)
+error_sampler = UniformSampler(3)
+# Coordinates guessed by the hybrid attack: 7^4 guesses per column.
+DEFAULT_GUESS = 4
 
-def sample_error_matrix(rows, cols):
-    return Matrix(ZZ, rows, cols, [sample(3) for _ in range(rows * cols)])
+def sample_error_matrix(rows, cols, engine=None, seed=None):
+    return get_engine(engine).matrix(rows, cols, error_sampler.sample(rows * cols, seed))
 
 def shake128(input_bytes, out_len):
     return hashlib.shake_128(input_bytes).digest(out_len)
 
-def generate_A(seedA):
-    buf = shake128(seedA, 2 * m * n)
-    vals = [int.from_bytes(buf[2*i:2*i+2], 'little') & (q-1) for i in range(m*n)]
-    return Matrix(ZZ, m, n, vals)
+A_cache = MatrixCache()
+
+def generate_A(seedA, engine=None):
+    # Cached per (seedA, engine); the returned matrix is read-only.
+    eng = get_engine(engine)
+    def expand():
+        buf = shake128(seedA, 2 * m * n)
+        return eng.from_u16(buf, m, n, mask=q-1)
+    return A_cache.get_or_compute((bytes(seedA), eng.name), expand)
 
 def encode_matrix(M):
-    return b"".join(int(x).to_bytes(2, 'little') for x in M.list())
+    return to_u16(M)
 
-def decode_matrix(bstr, rows, cols):
-    vals = [int.from_bytes(bstr[2*i:2*i+2], 'little') for i in range(rows*cols)]
-    return Matrix(ZZ, rows, cols, vals)
+def decode_matrix(bstr, rows, cols, engine=None):
+    return get_engine(engine).from_u16(bstr, rows, cols)
 
-def encode_mu(mu):
+def encode_mu(mu, engine=None):
     bits = [(mu[i//8] >> (i%8)) & 1 for i in range(mu_bytes*8)]
     vals = [(bits[2*i] | (bits[2*i+1] << 1)) for i in range(nbar*nbar)]
     step = q // 4
-    return Matrix(ZZ, nbar, nbar, [v * step for v in vals])
+    return get_engine(engine).matrix(nbar, nbar, [v * step for v in vals])
 
 def decode_mu(M):
     step = q // 4
-    flat = M.list()
+    flat = entries(M)
     two_bits = [int(round(v / step)) % 4 for v in flat]
     bits = []
     for tb in two_bits:
@@ -51,124 +58,129 @@ def decode_mu(M):
         mu_rec[i//8] |= (b << (i%8))
     return bytes(mu_rec)
 
-def frodokem_keygen():
+def frodokem_keygen(engine=None):
+    eng = get_engine(engine)
     seedA = os.urandom(seed_bytes)
-    A = generate_A(seedA)     # A is m × n
-    S = sample_error_matrix(n, nbar)   # S is n × nbar
-    E = sample_error_matrix(m, nbar)   # E is m × nbar
+    A = generate_A(seedA, eng.name)     # A is m × n
+    S = sample_error_matrix(n, nbar, eng.name)   # S is n × nbar
+    E = sample_error_matrix(m, nbar, eng.name)   # E is m × nbar
     #print(E)
-    B = (A * S + E).apply_map(lambda x: x % q)   # B is m × nbar
+    B = eng.mod(eng.mul(A, S) + E, q)   # B is m × nbar
     pk = seedA + encode_matrix(B)
     sk = S
     return pk, sk
 
-def frodokem_encapsulate(pk):
+def frodokem_encapsulate(pk, engine=None):
+    eng = get_engine(engine)
     seedA = pk[:seed_bytes]
-    B = decode_matrix(pk[seed_bytes:], m, nbar)
+    B = decode_matrix(memoryview(pk)[seed_bytes:], m, nbar, eng.name)
     mu = os.urandom(mu_bytes)
-    Sp = sample_error_matrix(nbar, m)  # Sp is nbar × m
-    Ep = sample_error_matrix(nbar, n)  # Ep is nbar × n
-    Epp = sample_error_matrix(nbar, nbar)
-    A = generate_A(seedA)  # m × n
-    Bp = (Sp * A + Ep).apply_map(lambda x: x % q)  # nbar × n
-    V = (Sp * B + Epp).apply_map(lambda x: x % q)  # nbar × nbar
-    MU = encode_mu(mu)
-    C2 = (V + MU).apply_map(lambda x: x % q)
+    Sp = sample_error_matrix(nbar, m, eng.name)  # Sp is nbar × m
+    Ep = sample_error_matrix(nbar, n, eng.name)  # Ep is nbar × n
+    Epp = sample_error_matrix(nbar, nbar, eng.name)
+    A = generate_A(seedA, eng.name)  # m × n
+    Bp = eng.mod(eng.mul(Sp, A) + Ep, q)  # nbar × n
+    V = eng.mod(eng.mul(Sp, B) + Epp, q)  # nbar × nbar
+    MU = encode_mu(mu, eng.name)
+    C2 = eng.mod(V + MU, q)
     ct = encode_matrix(Bp) + encode_matrix(C2)
     ss = hashlib.sha3_256(mu + ct).digest()[:mu_bytes]
     return ct, ss, mu
 
-def frodokem_decapsulate(pk, sk, ct):
+def frodokem_decapsulate(pk, sk, ct, engine=None):
+    eng = get_engine(engine)
     seedA = pk[:seed_bytes]
-    S = sk
+    S = eng.convert(sk)
     len_c1 = 2 * nbar * n  # Because Bp is nbar × n
-    Bp = decode_matrix(ct[:len_c1], nbar, n)
-    C2 = decode_matrix(ct[len_c1:], nbar, nbar)
-    Vp = (Bp * S).apply_map(lambda x: x % q)  # nbar × nbar
-    diff = (C2 - Vp).apply_map(lambda x: x % q)
+    Bp = decode_matrix(memoryview(ct)[:len_c1], nbar, n, eng.name)
+    C2 = decode_matrix(memoryview(ct)[len_c1:], nbar, nbar, eng.name)
+    Vp = eng.mod(eng.mul(Bp, S), q)  # nbar × nbar
+    diff = eng.mod(C2 - Vp, q)
     mu_rec = decode_mu(diff)
     ss = hashlib.sha3_256(mu_rec + ct).digest()[:mu_bytes]
     return mu_rec, ss
 
+def frodokem_encapsulate_batch(pk, count, engine=None):
+    # Parse pk and expand A once, then encapsulate `count` times with one
+    # stacked (count*nbar) x m product per matrix.
+    if count == 0:
+        return []
+    eng = get_engine(engine)
+    seedA = pk[:seed_bytes]
+    B = decode_matrix(memoryview(pk)[seed_bytes:], m, nbar, eng.name)
+    A = generate_A(seedA, eng.name)  # m × n
+    mus = [os.urandom(mu_bytes) for _ in range(count)]
+    Sp = sample_error_matrix(count * nbar, m, eng.name)
+    Ep = sample_error_matrix(count * nbar, n, eng.name)
+    Epp = sample_error_matrix(count * nbar, nbar, eng.name)
+    Bp = eng.mod(eng.mul(Sp, A) + Ep, q)  # (count*nbar) × n
+    V = eng.mod(eng.mul(Sp, B) + Epp, q)  # (count*nbar) × nbar
+    MU = eng.stack([encode_mu(mu, eng.name) for mu in mus])
+    C2 = eng.mod(V + MU, q)
+    c1_bytes, c2_bytes = encode_matrix(Bp), encode_matrix(C2)
+    len_c1, len_c2 = 2 * nbar * n, 2 * nbar * nbar
+    results = []
+    for k, mu in enumerate(mus):
+        ct = c1_bytes[k*len_c1:(k+1)*len_c1] + c2_bytes[k*len_c2:(k+1)*len_c2]
+        ss = hashlib.sha3_256(mu + ct).digest()[:mu_bytes]
+        results.append((ct, ss, mu))
+    return results
+
+def frodokem_decapsulate_batch(pk, sk, cts, engine=None):
+    eng = get_engine(engine)
+    S = eng.convert(sk)
+    len_c1 = 2 * nbar * n
+    Bp = decode_matrix(b"".join(ct[:len_c1] for ct in cts), len(cts) * nbar, n, eng.name)
+    C2 = decode_matrix(b"".join(ct[len_c1:] for ct in cts), len(cts) * nbar, nbar, eng.name)
+    Vp = eng.mod(eng.mul(Bp, S), q)
+    diff = eng.mod(C2 - Vp, q)
+    results = []
+    for k, ct in enumerate(cts):
+        mu_rec = decode_mu(diff[k*nbar:(k+1)*nbar, :])
+        ss = hashlib.sha3_256(mu_rec + ct).digest()[:mu_bytes]
+        results.append((mu_rec, ss))
+    return results
+
 def center_mod_q(vec, q):
     half_q = q // 2
     return [x - q if x > half_q else x for x in vec]
 
 def modq_to_centered_matrix(M, q):
     half_q = q // 2
-    return Matrix(ZZ, M.nrows(), M.ncols(),
-                  [x - q if x > half_q else x for x in M.list()])
-
-
-
-def recover_frodo_secret(A, B, q):
-    n, nbar = A.ncols(), B.ncols()
-    m = A.nrows()
-
-    recovered_S_cols = []
-
-    for col_idx in range(nbar):
-        b_col = list(B.column(col_idx))
-        A_list = [list(A.row(i)) for i in range(m)]
-        error_vector = recover_error_vector(A_list, b_col, q)
-        s_col = recover_secret(A_list, b_col, q, error_vector)
-        recovered_S_cols.append(s_col)
-     
-    S = Matrix(ZZ, n, nbar, [s[i] for s in recovered_S_cols for i in range(n)])
-    return S
-
-def recover_error_vector(A_list, b_list, q):
-    n = len(A_list[0])
-    m = len(A_list)
-    M = Matrix(ZZ, n + 1 + m, m + 1)
-
-    for i in range(m):
-        M[0, i] = b_list[i]
-    M[0, m] = q
-
-    for i in range(n):
-        for j in range(m):
-            M[i + 1, j] = A_list[j][i] % q
-
-    for i in range(m):
-        M[n + 1 + i, i] = q
-    L = M.LLL()
-    #L = M.BKZ(blocksize = 20)
-    err = center_mod_q(L[-1],q)
-    if err[-1] < 0:
-        err = [-e for e in err]
-    
-    assert err[-1] == q
-    assert all(abs(e) <= 3 for e in err[:-1])
-    return err[:-1]
-
-def recover_secret(A_list, b_list, q, error_vector):
-    R = IntegerModRing(q)
-    A = Matrix(R, [list(map(lambda x: x % q, row)) for row in A_list])
-    b_vec = vector(R, [(b - e) % q for b, e in zip(b_list, error_vector)])
-    try:
-        s = A.solve_right(b_vec)
-        return s
-    except ValueError:
-        ker = A.kernel()
-        if ker.dimension() == 0:
-            raise ValueError("No solution found")
-        particular = A.solve_right(b_vec)
-        
-        return particular
+    return get_engine("sage").matrix(M.nrows(), M.ncols(),
+                                     [x - q if x > half_q else x for x in M.list()])
 
 def matrix_from_row_major(data, rows, cols):
-    mat = Matrix(ZZ, rows, cols)
-    for i in range(rows):
-        for j in range(cols):
-            mat[i, j] = data[j*rows + i]
-    return mat
-
-def crack(pk):
+    return get_engine("sage").matrix(rows, cols, [data[j*rows + i] for i in range(rows) for j in range(cols)])
+
+def recover_frodo_secret_hybrid(A, B, q, guess, workers=1):
+    # Guess the last `guess` coordinates of every column over [-3, 3] and
+    # decode the rest against one reduced lattice.
+    from hybrid_attack import recover_secrets
+    bound = error_sampler.bound
+    A_rows = [[int(x) for x in A.row(i)] for i in range(A.nrows())]
+    b_cols = [[int(x) for x in B.column(j)] for j in range(B.ncols())]
+    cols = recover_secrets(A_rows, b_cols, q, range(-bound, bound + 1), bound, guess, workers)
+    return get_engine("sage").matrix(A.ncols(), B.ncols(), [s[i] % q for s in cols for i in range(A.ncols())])
+
+def crack(pk, workers=1, samples=None, attempts=1, policy=None, max_seconds=None, method="primal", guess=DEFAULT_GUESS,
+          calibration=None):
+    # policy="refuse" raises InfeasibleAttack for hopeless parameters,
+    # policy="downgrade" embeds only the planner's sample count instead.
+    # method="hybrid" guesses `guess` coordinates and ignores the primal
+    # options.
     seedA = pk[:seed_bytes]
-    A = generate_A(seedA)
-    B = decode_matrix(pk[seed_bytes:], A.nrows(), nbar)
-    S_recovered = recover_frodo_secret(A, B, q)
+    A = generate_A(seedA, "sage")
+    B = decode_matrix(memoryview(pk)[seed_bytes:], A.nrows(), nbar, "sage")
+    if method == "hybrid":
+        S_recovered = recover_frodo_secret_hybrid(A, B, q, guess, workers)
+    else:
+        estimate = estimate_frodo(n, q, m, nbar, bound=error_sampler.bound, sigma=error_sampler.sigma,
+                                  calibration=calibration)
+        if enforce(estimate, policy, max_seconds) == "downgrade":
+            samples = "auto"
+        S_recovered = recover_frodo_secret(A, B, q, error_sampler.bound, workers=workers, samples=samples,
+                                           attempts=attempts, sigma=error_sampler.sigma)
     #print("[+] Recovered S matrix:")
     #print(S_recovered)
     result = modq_to_centered_matrix(S_recovered,q)
@@ -185,4 +197,7 @@ def example():
     print("Recovered mu match original:", mu_rec == mu, mu_rec.hex())
 
 if __name__ == '__main__':
-    example()
+    try:
+        example()
+    except SageRequired as e:
+        raise SystemExit(f"error: {e}")
@@ -1,24 +1,48 @@
 import time
-from sage.all import GF
+import argparse
+from functools import partial
+from sage.all import GF, Matrix
 import random
+from timing import phase
+from estimator import estimate_arora_ge, enforce, InfeasibleAttack, add_policy_arguments, load_calibration
+from linearization import build_system, system_polynomials, solve_linearized
+from sweep import sweep_benchmark, add_sweep_arguments, sweep_options
 
-def arora_ge_attack(q, A, b, E):
+SOLVERS = ("auto", "linearization", "groebner")
+
+def arora_ge_attack(q, A, b, E, policy=None, max_seconds=None, solver="auto", calibration=None):
+    """
+    solver: "linearization" solves the linearized system only, "groebner"
+    always computes a Groebner basis, "auto" linearizes when there are
+    enough samples and falls back to Groebner otherwise.
+    """
+    if solver not in SOLVERS:
+        raise ValueError(f"Unknown solver {solver!r}")
     m = len(A)
     n = len(A[0])
+    estimate = estimate_arora_ge(n, q, m, E, calibration)
+    # Underdetermined systems need a Groebner basis of unknown cost; with a
+    # policy set they are refused ("downgrade" has nothing cheaper to try).
+    if enforce(estimate, policy, max_seconds) == "downgrade":
+        raise InfeasibleAttack(f"Arora-Ge attack refused for n={n}, q={q}, m={m}")
     gf = GF(q)
     pr = gf[tuple(f"x{i}" for i in range(n))]
-    gens = pr.gens()
 
-    polys = []
-    for i in range(m):
-        p = 1
-        inner = sum(A[i][j] * gens[j] for j in range(n))
-        for e in E:
-            p *= (b[i] - inner - e)
-        polys.append(p)
+    with phase("construction"):
+        M = build_system(q, A, b, E)
 
-    I = pr.ideal(polys)
-    G = I.groebner_basis()
+    if solver == "linearization" or (solver == "auto" and estimate["feasible"]):
+        with phase("solve"):
+            s = solve_linearized(Matrix(gf, M.tolist()), n)
+        if s is not None or solver == "linearization":
+            return s
+
+    with phase("construction"):
+        polys = system_polynomials(pr, M, n, len(E))
+
+    with phase("groebner"):
+        I = pr.ideal(polys)
+        G = I.groebner_basis()
 
     s = []
     for p in G:
@@ -32,7 +56,18 @@ def arora_ge_attack(q, A, b, E):
         return None
 
 
-def benchmark_arora_ge(parameter_sets, E=[-1, 0, 1]):
+def generate_instance(n, q, m, E):
+    s_real = [random.randint(0, q - 1) for _ in range(n)]
+    A = [[random.randint(0, q - 1) for _ in range(n)] for _ in range(m)]
+    b = []
+    for i in range(m):
+        noise = random.choice(E)
+        inner = sum(A[i][j] * s_real[j] for j in range(n)) % q
+        b.append((inner + noise) % q)
+    return s_real, A, b
+
+
+def benchmark_arora_ge(parameter_sets, E=[-1, 0, 1], solver="auto", policy=None, max_seconds=None, calibration=None):
     """
     parameter_sets: list of tuples (n, q, m)
     """
@@ -40,16 +75,10 @@ def benchmark_arora_ge(parameter_sets, E=[-1, 0, 1]):
 
     for (n, q, m) in parameter_sets:
         print(f"Running for n={n}, q={q}, m={m}")
-        s_real = [random.randint(0, q - 1) for _ in range(n)]
-        A = [[random.randint(0, q - 1) for _ in range(n)] for _ in range(m)]
-        b = []
-        for i in range(m):
-            noise = random.choice(E)
-            inner = sum(A[i][j] * s_real[j] for j in range(n)) % q
-            b.append((inner + noise) % q)
+        s_real, A, b = generate_instance(n, q, m, E)
 
         start = time.time()
-        recovered = arora_ge_attack(q, A, b, E)
+        recovered = arora_ge_attack(q, A, b, E, policy, max_seconds, solver, calibration)
         end = time.time()
 
         success = (recovered is not None and len(recovered) == n and all((recovered[i] - s_real[i]) % q == 0 for i in range(n)))
@@ -67,22 +96,32 @@ def benchmark_arora_ge(parameter_sets, E=[-1, 0, 1]):
     return results
 
 if __name__ == "__main__":
-    
+    parser = argparse.ArgumentParser()
+    add_sweep_arguments(parser)
+    parser.add_argument("--full", action="store_true", help="sweep m from 50n down to n+1 (long, use --checkpoint)")
+    parser.add_argument("--solver", choices=SOLVERS, default="auto", help="linearization, Groebner basis, or linearization when m suffices")
+    add_policy_arguments(parser)
+    args = parser.parse_args()
+
     parameter_sets = [
         (15, 65537, 15*10),
         (15, 65537, 15*8),
         (15, 65537, 15*4),
-        (15, 65537, 15*2)
+        (15, 65537, 15*2),
+        # Enough samples (m >= C(n+3, 3)) for the linearization solver.
+        (15, 65537, 900),
+        (20, 65537, 1800)
     ]
-    
-    """
-    n = 15
-    q = 65537
-    parameter_sets = []
-    for i in range(n*50,n+1,-n):
-        parameter_sets.append((n,q,i))
-    """
-    results = benchmark_arora_ge(parameter_sets)
+
+    if args.full:
+        n = 15
+        q = 65537
+        parameter_sets = []
+        for i in range(n*50,n+1,-n):
+            parameter_sets.append((n,q,i))
+    results = sweep_benchmark(partial(benchmark_arora_ge, solver=args.solver, policy=args.policy, max_seconds=args.max_seconds,
+                                      calibration=load_calibration(args.calibration)),
+                              parameter_sets, **sweep_options(args))
     print("\nSummary:")
     for r in results:
         print(f"n={r['n']}, q={r['q']}, m={r['m']} → Success={r['success']} | Time={r['time_sec']:.5f} s")
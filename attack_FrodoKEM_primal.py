@@ -1,7 +1,19 @@
 import os
 import hashlib
 import argparse
-from sage.all import *
+import glob
+import mmap
+import sys
+import numpy as np
+from matrix_cache import MatrixCache
+from basis_cache import set_cache_dir, DEFAULT_DIR
+from samplers import BinomialSampler
+from sample_planner import parse_samples
+from estimator import estimate_frodo, enforce, add_policy_arguments, load_calibration
+from frodo_recovery import recover_frodo_secret
+from reduction import set_checkpoint_dir
+from key_store import KeyStore, key_store
+from frodo_engine import get_engine, entries, to_u16, set_default_engine, SageRequired
 #23:09 - 10p
 m = 80
 n = 40
@@ -9,36 +21,43 @@ nbar = 8
 q = 2**15
 message_bytes = 16
 seed_bytes = 16
+ct_bytes = 2 * nbar * n + 2 * nbar * nbar
+# Coordinates guessed by the hybrid attack: 3^8 guesses per column.
+DEFAULT_GUESS = 8
 
-def sample_error_matrix(rows, cols):
-    def sample():
-        return sum((1 if os.urandom(1)[0] & (1 << i) else 0) - (1 if os.urandom(1)[0] & (1 << i) else 0) for i in range(1))
-    return Matrix(ZZ, rows, cols, [sample() for _ in range(rows * cols)])
+error_sampler = BinomialSampler(1)
+
+def sample_error_matrix(rows, cols, engine=None, seed=None):
+    return get_engine(engine).matrix(rows, cols, error_sampler.sample(rows * cols, seed))
 
 def shake128(input_bytes, out_len):
     return hashlib.shake_128(input_bytes).digest(out_len)
 
-def generate_A(seedA):
-    buf = shake128(seedA, 2 * m * n)
-    vals = [int.from_bytes(buf[2*i:2*i+2], 'little') & (q-1) for i in range(m*n)]
-    return Matrix(ZZ, m, n, vals)
+A_cache = MatrixCache()
+
+def generate_A(seedA, engine=None):
+    # Cached per (seedA, engine); the returned matrix is read-only.
+    eng = get_engine(engine)
+    def expand():
+        buf = shake128(seedA, 2 * m * n)
+        return eng.from_u16(buf, m, n, mask=q-1)
+    return A_cache.get_or_compute((bytes(seedA), eng.name), expand)
 
 def encode_matrix(M):
-    return b"".join(int((x+q)%q).to_bytes(2, 'little') for x in M.list())
+    return to_u16(M, q)
 
-def decode_matrix(bstr, rows, cols):
-    vals = [int.from_bytes(bstr[2*i:2*i+2], 'little') for i in range(rows*cols)]
-    return Matrix(ZZ, rows, cols, vals)
+def decode_matrix(bstr, rows, cols, engine=None):
+    return get_engine(engine).from_u16(bstr, rows, cols)
 
-def encode_message(message):
+def encode_message(message, engine=None):
     bits = [(message[i//8] >> (i%8)) & 1 for i in range(message_bytes*8)]
     vals = [(bits[2*i] | (bits[2*i+1] << 1)) for i in range(nbar*nbar)]
     step = q // 4
-    return Matrix(ZZ, nbar, nbar, [v * step for v in vals])
+    return get_engine(engine).matrix(nbar, nbar, [v * step for v in vals])
 
 def decode_message(M):
     step = q // 4
-    flat = M.list()
+    flat = entries(M)
     two_bits = [int(round(v / step)) % 4 for v in flat]
     bits = []
     for tb in two_bits:
@@ -49,82 +68,94 @@ def decode_message(M):
         message[i//8] |= (b << (i%8))
     return bytes(message)
 
-def frodokem_keygen():
+def frodokem_keygen(engine=None):
+    eng = get_engine(engine)
     seedA = os.urandom(seed_bytes)
-    A = generate_A(seedA)
-    S = sample_error_matrix(n, nbar)
-    E = sample_error_matrix(m, nbar)
-    B = (A * S + E).apply_map(lambda x: x % q)
+    A = generate_A(seedA, eng.name)
+    S = sample_error_matrix(n, nbar, eng.name)
+    E = sample_error_matrix(m, nbar, eng.name)
+    B = eng.mod(eng.mul(A, S) + E, q)
     pk = seedA + encode_matrix(B)
     return pk, S
 
-def frodokem_encapsulate(pk, message=None):
+def frodokem_encapsulate(pk, message=None, engine=None):
+    eng = get_engine(engine)
     seedA = pk[:seed_bytes]
-    B = decode_matrix(pk[seed_bytes:], m, nbar)
+    B = decode_matrix(memoryview(pk)[seed_bytes:], m, nbar, eng.name)
     if message is None:
         message = os.urandom(message_bytes)
     elif len(message) > message_bytes:
         raise ValueError("Message too long, max 16 bytes")
     message = message.ljust(message_bytes, b'\x00')
-    Sp = sample_error_matrix(nbar, m)
-    Ep = sample_error_matrix(nbar, n)
-    Epp = sample_error_matrix(nbar, nbar)
-    A = generate_A(seedA)
-    C1 = (Sp * A + Ep).apply_map(lambda x: x % q)
-    V = (Sp * B + Epp).apply_map(lambda x: x % q)
-    Encode_message = encode_message(message)
-    C2 = (V + Encode_message).apply_map(lambda x: x % q)
+    Sp = sample_error_matrix(nbar, m, eng.name)
+    Ep = sample_error_matrix(nbar, n, eng.name)
+    Epp = sample_error_matrix(nbar, nbar, eng.name)
+    A = generate_A(seedA, eng.name)
+    C1 = eng.mod(eng.mul(Sp, A) + Ep, q)
+    V = eng.mod(eng.mul(Sp, B) + Epp, q)
+    Encode_message = encode_message(message, eng.name)
+    C2 = eng.mod(V + Encode_message, q)
     ct = encode_matrix(C1) + encode_matrix(C2)
     ss = hashlib.sha3_256(message + ct).digest()[:message_bytes]
     return ct, ss, message
 
-def frodokem_decapsulate(pk, sk, ct):
+def frodokem_decapsulate(pk, sk, ct, engine=None):
+    eng = get_engine(engine)
     seedA = pk[:seed_bytes]
     len_c1 = 2 * nbar * n
-    C1 = decode_matrix(ct[:len_c1], nbar, n)
-    C2 = decode_matrix(ct[len_c1:], nbar, nbar)
-    Vp = (C1 * sk).apply_map(lambda x: x % q)
-    Mp = (C2 - Vp).apply_map(lambda x: x % q)
+    C1 = decode_matrix(memoryview(ct)[:len_c1], nbar, n, eng.name)
+    C2 = decode_matrix(memoryview(ct)[len_c1:], nbar, nbar, eng.name)
+    Vp = eng.mod(eng.mul(C1, eng.convert(sk)), q)
+    Mp = eng.mod(C2 - Vp, q)
     message = decode_message(Mp)
     ss = hashlib.sha3_256(message + ct).digest()[:message_bytes]
     return message, ss
 
-def recover_error_vector(A_list, b_list, q):
-    n = len(A_list[0])
-    m = len(A_list)
-    M = Matrix(ZZ, n + 1 + m, m + 1)
-
-    for i in range(m):
-        M[0, i] = b_list[i]
-    M[0, m] = q
-
-    for i in range(n):
-        for j in range(m):
-            M[i + 1, j] = A_list[j][i] % q
-
-    for i in range(m):
-        M[n + 1 + i, i] = q
-    L = M.LLL()
-    err = center_mod_q(L[-1],q)
-    if err[-1] < 0:
-        err = [-e for e in err]
-    assert err[-1] == q
-    assert all(abs(e) <= 1 for e in err[:-1])
-    return err[:-1]
-
-def recover_secret(A_list, b_list, q, error_vector):
-    R = IntegerModRing(q)
-    A = Matrix(R, [list(map(lambda x: x % q, row)) for row in A_list])
-    b_vec = vector(R, [(b - e) % q for b, e in zip(b_list, error_vector)])
-    try:
-        s = A.solve_right(b_vec)
-        return s
-    except ValueError:
-        ker = A.kernel()
-        if ker.dimension() == 0:
-            raise ValueError("No solution found")
-        particular = A.solve_right(b_vec)
-        return particular
+def frodokem_encapsulate_batch(pk, count, messages=None, engine=None):
+    # Parse pk and expand A once, then encapsulate `count` messages with one
+    # stacked (count*nbar) x m product per matrix.
+    if count == 0 and not messages:
+        return []
+    eng = get_engine(engine)
+    seedA = pk[:seed_bytes]
+    B = decode_matrix(memoryview(pk)[seed_bytes:], m, nbar, eng.name)
+    A = generate_A(seedA, eng.name)
+    if messages is None:
+        messages = [os.urandom(message_bytes) for _ in range(count)]
+    elif len(messages) != count:
+        raise ValueError("Expected one message per ciphertext")
+    if any(len(message) > message_bytes for message in messages):
+        raise ValueError("Message too long, max 16 bytes")
+    messages = [message.ljust(message_bytes, b'\x00') for message in messages]
+    Sp = sample_error_matrix(count * nbar, m, eng.name)
+    Ep = sample_error_matrix(count * nbar, n, eng.name)
+    Epp = sample_error_matrix(count * nbar, nbar, eng.name)
+    C1 = eng.mod(eng.mul(Sp, A) + Ep, q)
+    V = eng.mod(eng.mul(Sp, B) + Epp, q)
+    Encode_messages = eng.stack([encode_message(message, eng.name) for message in messages])
+    C2 = eng.mod(V + Encode_messages, q)
+    c1_bytes, c2_bytes = encode_matrix(C1), encode_matrix(C2)
+    len_c1, len_c2 = 2 * nbar * n, 2 * nbar * nbar
+    results = []
+    for k, message in enumerate(messages):
+        ct = c1_bytes[k*len_c1:(k+1)*len_c1] + c2_bytes[k*len_c2:(k+1)*len_c2]
+        ss = hashlib.sha3_256(message + ct).digest()[:message_bytes]
+        results.append((ct, ss, message))
+    return results
+
+def frodokem_decapsulate_batch(pk, sk, cts, engine=None):
+    eng = get_engine(engine)
+    len_c1 = 2 * nbar * n
+    C1 = decode_matrix(b"".join(ct[:len_c1] for ct in cts), len(cts) * nbar, n, eng.name)
+    C2 = decode_matrix(b"".join(ct[len_c1:] for ct in cts), len(cts) * nbar, nbar, eng.name)
+    Vp = eng.mod(eng.mul(C1, eng.convert(sk)), q)
+    Mp = eng.mod(C2 - Vp, q)
+    results = []
+    for k, ct in enumerate(cts):
+        message = decode_message(Mp[k*nbar:(k+1)*nbar, :])
+        ss = hashlib.sha3_256(message + ct).digest()[:message_bytes]
+        results.append((message, ss))
+    return results
 
 def center_mod_q(vec, q):
     half_q = q // 2
@@ -132,41 +163,140 @@ def center_mod_q(vec, q):
 
 def modq_to_centered_matrix(M, q):
     half_q = q // 2
-    return Matrix(ZZ, M.nrows(), M.ncols(), [x - q if x > half_q else x for x in M.list()])
-
-def recover_frodo_secret(A, B, q):
-    n, nbar = A.ncols(), B.ncols()
-    m = A.nrows()
-    recovered_S_cols = []
-    for col_idx in range(nbar):
-        b_col = list(B.column(col_idx))
-        A_list = [list(A.row(i)) for i in range(m)]
-        error_vector = recover_error_vector(A_list, b_col, q)
-        s_col = recover_secret(A_list, b_col, q, error_vector)
-        recovered_S_cols.append(s_col)
-    S = Matrix(ZZ, n, nbar, [s[i] for s in recovered_S_cols for i in range(n)])
-    return S
+    return get_engine("sage").matrix(M.nrows(), M.ncols(), [x - q if x > half_q else x for x in M.list()])
 
 def matrix_from_row_major(data, rows, cols):
-    mat = Matrix(ZZ, rows, cols)
-    for i in range(rows):
-        for j in range(cols):
-            mat[i, j] = data[j*rows + i]
-    return mat
-
-def crack_and_recover(pk, ct):
+    return get_engine("sage").matrix(rows, cols, [data[j*rows + i] for i in range(rows) for j in range(cols)])
+
+def recover_frodo_secret_dual(A, B, q):
+    # All nbar columns from one set of dual reductions of A (dual_attack),
+    # guessing the secret coordinates over the sampler's support.
+    from dual_attack import recover_secrets
+    bound = error_sampler.bound
+    A_rows = [[int(x) for x in A.row(i)] for i in range(A.nrows())]
+    b_cols = [[int(x) for x in B.column(j)] for j in range(B.ncols())]
+    cols = recover_secrets(A_rows, b_cols, q, range(-bound, bound + 1))
+    return get_engine("sage").matrix(A.ncols(), B.ncols(), [s[i] % q for s in cols for i in range(A.ncols())])
+
+def recover_frodo_secret_hybrid(A, B, q, guess, workers=1):
+    # Guess the last `guess` coordinates of every column over the ternary
+    # secret support and decode the rest against one reduced lattice.
+    from hybrid_attack import recover_secrets
+    bound = error_sampler.bound
+    A_rows = [[int(x) for x in A.row(i)] for i in range(A.nrows())]
+    b_cols = [[int(x) for x in B.column(j)] for j in range(B.ncols())]
+    cols = recover_secrets(A_rows, b_cols, q, range(-bound, bound + 1), bound, guess, workers)
+    return get_engine("sage").matrix(A.ncols(), B.ncols(), [s[i] % q for s in cols for i in range(A.ncols())])
+
+def check_key(pk, sk):
+    # Raise ValueError unless B - A*sk (mod q, centred) is within the error
+    # bound for every column, i.e. sk is a valid secret for pk.
+    eng = get_engine("numpy")
+    A = generate_A(pk[:seed_bytes], "numpy")
+    B = decode_matrix(memoryview(pk)[seed_bytes:], m, nbar, "numpy")
+    E = eng.mod(B - A @ eng.convert(sk), q)
+    E = (E + q // 2) % q - q // 2
+    bad = np.nonzero(np.abs(E).max(axis=0) > error_sampler.bound)[0]
+    if bad.size:
+        raise ValueError(f"Recovered key does not match pk in column(s) {', '.join(map(str, bad))}")
+
+def crack_key(pk, workers=1, samples=None, attempts=1, policy=None, max_seconds=None, method="primal", guess=DEFAULT_GUESS,
+              calibration=None):
+    # policy="refuse" raises InfeasibleAttack for hopeless parameters,
+    # policy="downgrade" embeds only the planner's sample count instead.
+    # method="dual" and method="hybrid" (guessing `guess` coordinates)
+    # ignore the primal options.
     seedA = pk[:seed_bytes]
-    A = generate_A(seedA)
-    B = decode_matrix(pk[seed_bytes:], m, nbar)
-    S_recovered = recover_frodo_secret(A, B, q)
+    A = generate_A(seedA, "sage")
+    B = decode_matrix(memoryview(pk)[seed_bytes:], m, nbar, "sage")
+    if method == "dual":
+        S_recovered = recover_frodo_secret_dual(A, B, q)
+    elif method == "hybrid":
+        S_recovered = recover_frodo_secret_hybrid(A, B, q, guess, workers)
+    else:
+        estimate = estimate_frodo(n, q, m, nbar, bound=error_sampler.bound, sigma=error_sampler.sigma,
+                                  calibration=calibration)
+        if enforce(estimate, policy, max_seconds) == "downgrade":
+            samples = "auto"
+        S_recovered = recover_frodo_secret(A, B, q, error_sampler.bound, workers=workers, samples=samples,
+                                           attempts=attempts, sigma=error_sampler.sigma)
     S_centered = modq_to_centered_matrix(S_recovered, q)
     sk = matrix_from_row_major(S_centered.list(), n, nbar)
+    check_key(pk, sk)
+    return sk
+
+def crack_and_recover(pk, ct, workers=1, samples=None, attempts=1, policy=None, max_seconds=None, method="primal", guess=DEFAULT_GUESS,
+                      calibration=None):
+    sk = crack_key(pk, workers, samples, attempts, policy, max_seconds, method, guess, calibration)
     message, ss = frodokem_decapsulate(pk, sk, ct)
     return message
 
+def recovered_key(pk, store=None, engine=None, **crack_options):
+    # sk for pk from the key store, cracking (and storing) it on first use.
+    store = key_store if store is None else store
+    sk_bytes = store.get(pk)
+    if sk_bytes is None:
+        sk = crack_key(pk, **crack_options)
+        # Never persist a key that does not decrypt pk's ciphertexts.
+        check_key(pk, sk)
+        sk_bytes = encode_matrix(sk)
+        store.put(pk, sk_bytes)
+    return decode_matrix(sk_bytes, n, nbar, engine)
+
+def iter_ciphertexts(sources):
+    # (name, ct) for every source: a file, each file of a directory, a glob
+    # pattern, or "-" for back-to-back ciphertexts on stdin.
+    for src in sources:
+        if src == "-":
+            stream = sys.stdin.buffer
+            index = 0
+            while True:
+                ct = stream.read(ct_bytes)
+                if not ct:
+                    break
+                yield f"stdin:{index}", ct
+                index += 1
+        elif os.path.isdir(src):
+            for name in sorted(os.listdir(src)):
+                path = os.path.join(src, name)
+                if os.path.isfile(path):
+                    yield path, read_blob(path)
+        elif any(c in src for c in "*?["):
+            for path in sorted(glob.glob(src)):
+                if os.path.isfile(path):
+                    yield path, read_blob(path)
+        else:
+            yield src, read_blob(src)
+
+def _decapsulate_chunk(pk, sk, chunk, engine=None):
+    good = [ct for _, ct in chunk if len(ct) == ct_bytes]
+    results = iter(frodokem_decapsulate_batch(pk, sk, good, engine) if good else [])
+    return [(name, next(results)[0] if len(ct) == ct_bytes else None) for name, ct in chunk]
+
+def decapsulate_stream(pk, sk, items, batch=256, engine=None):
+    # Yields (name, message) in input order, decapsulating `batch`
+    # ciphertexts per matrix product; malformed ciphertexts give None.
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) == batch:
+            yield from _decapsulate_chunk(pk, sk, chunk, engine)
+            chunk = []
+    if chunk:
+        yield from _decapsulate_chunk(pk, sk, chunk, engine)
+
+
+def read_blob(path, mmap_threshold=1 << 20):
+    # Large pk/ct files are mapped rather than read; the KEM functions only
+    # take memoryview slices of them, so nothing is copied.
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size < mmap_threshold:
+            return f.read()
+        return memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
 
 def main():
     parser = argparse.ArgumentParser()
+    parser.add_argument("--engine", choices=["sage", "numpy"], help="arithmetic engine for keygen/encaps/decaps")
     subparsers = parser.add_subparsers(dest='command')
 
     parser_keygen = subparsers.add_parser("keygen")
@@ -185,9 +315,31 @@ def main():
 
     parser_crack = subparsers.add_parser("crack")
     parser_crack.add_argument("pk_file")
-    parser_crack.add_argument("ct_file")
+    parser_crack.add_argument("ct", nargs="+", help="ciphertext file, directory, glob pattern, or - for a stream on stdin")
+    parser_crack.add_argument("--key-store", metavar="DIR", help="recovered-key store (default: $FRODO_KEY_STORE or ~/.cache/frodo-keys)")
+    parser_crack.add_argument("--batch", type=int, default=256, help="ciphertexts decapsulated per batch")
+    parser_crack.add_argument("--method", choices=["primal", "dual", "hybrid"], default="primal", help="key-recovery attack")
+    parser_crack.add_argument("--guess", type=int, default=DEFAULT_GUESS, help="secret coordinates guessed by --method hybrid")
+    parser_crack.add_argument("--jobs", type=int, default=1, help="worker processes for column recovery")
+    parser_crack.add_argument("--samples", type=parse_samples, help="samples to embed: a count or 'auto' (default: all)")
+    parser_crack.add_argument("--attempts", type=int, default=1, help="subsets to try per column when --samples is set")
+    add_policy_arguments(parser_crack)
+    parser_crack.add_argument("--reduction-checkpoints", metavar="DIR", help="save and resume partial reductions in DIR")
+    parser_crack.add_argument("--basis-cache", metavar="DIR", nargs="?", const=DEFAULT_DIR,
+                              help=f"also cache reduced bases on disk, in DIR or {DEFAULT_DIR}")
 
     args = parser.parse_args()
+    if args.engine:
+        set_default_engine(args.engine)
+    elif not os.environ.get("FRODO_ENGINE"):
+        # Bit-identical to the sage engine, without paying for importing Sage.
+        set_default_engine("numpy")
+    if args.command == "crack" and isinstance(args.samples, int) and args.samples <= n:
+        parser.error(f"--samples must be more than n={n}")
+    if args.command == "crack" and args.reduction_checkpoints:
+        set_checkpoint_dir(args.reduction_checkpoints)
+    if args.command == "crack" and args.basis_cache:
+        set_cache_dir(args.basis_cache)
 
     if args.command == "keygen":
         pk, sk = frodokem_keygen()
@@ -196,25 +348,39 @@ def main():
         print("Keys generated.")
 
     elif args.command == "encaps":
-        with open(args.pk_file, "rb") as f: pk = f.read()
+        pk = read_blob(args.pk_file)
         message = args.message.encode('utf-8')[:message_bytes]
         ct, _, _ = frodokem_encapsulate(pk, message)
         with open(args.ct_file, "wb") as f: f.write(ct)
         print("Ciphertext saved.")
 
     elif args.command == "decaps":
-        with open(args.pk_file, "rb") as f: pk = f.read()
-        with open(args.sk_file, "rb") as f: sk_bytes = f.read()
+        pk = read_blob(args.pk_file)
+        sk_bytes = read_blob(args.sk_file)
         sk = decode_matrix(sk_bytes, n, nbar)
-        with open(args.ct_file, "rb") as f: ct = f.read()
+        ct = read_blob(args.ct_file)
         message, _ = frodokem_decapsulate(pk, sk, ct)
         print("Recovered message:", message.rstrip(b'\x00').decode('utf-8', errors='ignore'))
 
     elif args.command == "crack":
-        with open(args.pk_file, "rb") as f: pk = f.read()
-        with open(args.ct_file, "rb") as f: ct = f.read()
-        message = crack_and_recover(pk, ct)
-        print("Cracked message:", message.rstrip(b'\x00').decode('utf-8', errors='ignore'))
+        pk = read_blob(args.pk_file)
+        store = KeyStore(args.key_store) if args.key_store else None
+        sk = recovered_key(pk, store, workers=args.jobs, samples=args.samples, attempts=args.attempts,
+                           policy=args.policy, max_seconds=args.max_seconds, method=args.method, guess=args.guess,
+                           calibration=load_calibration(args.calibration))
+        single = len(args.ct) == 1 and os.path.isfile(args.ct[0])
+        for name, message in decapsulate_stream(pk, sk, iter_ciphertexts(args.ct), args.batch):
+            if message is None:
+                print(f"{name}: malformed ciphertext (expected {ct_bytes} bytes)", file=sys.stderr)
+                continue
+            text = message.rstrip(b'\x00').decode('utf-8', errors='ignore')
+            if single:
+                print("Cracked message:", text)
+            else:
+                print(f"{name}\t{text}", flush=True)
 
 if __name__ == "__main__":
-    main()
+    try:
+        main()
+    except SageRequired as e:
+        sys.exit(f"error: {e}")
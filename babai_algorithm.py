@@ -1,7 +1,15 @@
 import time
+import argparse
+from functools import partial
 from sage.all import *
-from sage.modules.free_module_integer import IntegerLattice
 import random
+from timing import phase
+from estimator import estimate_babai, enforce, InfeasibleAttack, add_policy_arguments, load_calibration
+from lattice_construction import qary_basis
+from nearest_plane import NearestPlane
+from basis_cache import basis_store, set_cache_dir, DEFAULT_DIR
+from reduction import lll_reduce, set_checkpoint_dir
+from sweep import sweep_benchmark, add_sweep_arguments, sweep_options
 
 def lwe_generate_instance(n, q, m, p, E_vals=[-3, 0, 3]):
     S = vector(ZZ, [randint(0, p - 1) for _ in range(n)])
@@ -10,45 +18,61 @@ def lwe_generate_instance(n, q, m, p, E_vals=[-3, 0, 3]):
     B = vector(ZZ, [(A_matrix[i] * S + E[i]) % q for i in range(m)])
     return A_matrix, S, B
 
-def Babai_closest_vector(M, G, target):
-    small = target
-    for _ in range(1):  
-        for i in reversed(range(M.nrows())):
-            c = ((small * G[i]) / (G[i] * G[i])).round()
-            small -= M[i] * c
-    return target - small
-
-def lwe_babai_attack(A_matrix, B_vector, q):
+def _solve_secrets(A_matrix, closest, q):
     n = A_matrix.ncols()
     m = A_matrix.nrows()
-    L = Matrix(ZZ, n + m, m)
-    for i in range(m):
-        L[i, i] = q
-    for x in range(m):
-        for y in range(n):
-            L[m + y, x] = A_matrix[x][y] % q
-
-    lattice = IntegerLattice(L, lll_reduce=True)
-    G = lattice.reduced_basis.gram_schmidt()[0]
-    target = vector(ZZ, B_vector)
-    res = Babai_closest_vector(lattice.reduced_basis, G, target)
     A_mod = Matrix(ZZ, [[A_matrix[x][y] % q for y in range(n)] for x in range(m)])
-    R = IntegerModRing(q)
+    M = Matrix(IntegerModRing(q), A_mod)
     try:
-        M = Matrix(R, A_mod)
-        S_recovered = M.solve_right(res)
-        return [int(S_recovered[i]) for i in range(n)]
+        S = M.solve_right(Matrix(M.base_ring(), [list(v) for v in closest]).transpose())
+        return [[int(x) for x in S.column(j)] for j in range(S.ncols())]
     except:
-        return None  
+        pass
+    # Some target decoded to a point outside the image of A; solve one by one.
+    secrets = []
+    for v in closest:
+        try:
+            S_recovered = M.solve_right(vector(M.base_ring(), list(v)))
+            secrets.append([int(S_recovered[i]) for i in range(n)])
+        except:
+            secrets.append(None)
+    return secrets
+
+def lwe_babai_attack_batch(A_matrix, B_vectors, q, policy=None, error_values=(-3, 0, 3), max_seconds=None, calibration=None):
+    """
+    Recover one secret per target in B_vectors (all for the same A): the
+    basis is reduced and its Gram-Schmidt data computed once, then every
+    target is decoded in one batched nearest-plane pass. Returns a list
+    with a secret (list of ints) or None per target.
+    """
+    n = A_matrix.ncols()
+    m = A_matrix.nrows()
+    # There is no cheaper configuration to fall back to, so "downgrade"
+    # refuses as well.
+    estimate = estimate_babai(n, q, m, values=error_values, calibration=calibration)
+    if enforce(estimate, policy, max_seconds) == "downgrade":
+        raise InfeasibleAttack(f"Babai attack refused for n={n}, q={q}, m={m}")
+    with phase("construction"):
+        L = qary_basis([list(A_matrix[x]) for x in range(m)], q)
+
+    reduced = basis_store.get_or_reduce(L, lll_reduce, "LLL")
+    with phase("cvp"):
+        decoder = NearestPlane(reduced)
+        closest = decoder.closest([[int(x) for x in b] for b in B_vectors])
+    with phase("solve"):
+        return _solve_secrets(A_matrix, closest, q)
+
+def lwe_babai_attack(A_matrix, B_vector, q, policy=None, error_values=(-3, 0, 3), max_seconds=None, calibration=None):
+    return lwe_babai_attack_batch(A_matrix, [B_vector], q, policy, error_values, max_seconds, calibration)[0]
 
-def benchmark_lwe_babai(parameter_sets, p=257, E=[-3, 0, 3]):
+def benchmark_lwe_babai(parameter_sets, p=257, E=[-3, 0, 3], policy=None, max_seconds=None, calibration=None):
     results = []
 
     for (n, q, m) in parameter_sets:
         print(f"Running for n={n}, q={q}, m={m}")
         A, S_real, B = lwe_generate_instance(n, q, m, p, E)
         start = time.time()
-        recovered = lwe_babai_attack(A, B, q)
+        recovered = lwe_babai_attack(A, B, q, policy, E, max_seconds, calibration)
         end = time.time()
         success = recovered is not None and all((recovered[i] - S_real[i]) % q == 0 for i in range(n))
         elapsed = end - start
@@ -64,11 +88,24 @@ def benchmark_lwe_babai(parameter_sets, p=257, E=[-3, 0, 3]):
     return results
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    add_sweep_arguments(parser)
+    parser.add_argument("--reduction-checkpoints", metavar="DIR", help="save and resume partial reductions in DIR")
+    parser.add_argument("--basis-cache", metavar="DIR", nargs="?", const=DEFAULT_DIR,
+                        help=f"also cache reduced bases on disk, in DIR or {DEFAULT_DIR}")
+    add_policy_arguments(parser)
+    args = parser.parse_args()
+    if args.reduction_checkpoints:
+        set_checkpoint_dir(args.reduction_checkpoints)
+    if args.basis_cache:
+        set_cache_dir(args.basis_cache)
     parameter_sets = [
     (10, 65537, 15)
     ]
 
-    results = benchmark_lwe_babai(parameter_sets)
+    results = sweep_benchmark(partial(benchmark_lwe_babai, policy=args.policy, max_seconds=args.max_seconds,
+                                      calibration=load_calibration(args.calibration)),
+                              parameter_sets, **sweep_options(args))
     print("\nSummary:")
     for r in results:
         print(f"n={r['n']}, q={r['q']}, m={r['m']} → Success={r['success']} | Time={r['time_sec']:.5f} s")
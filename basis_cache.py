@@ -0,0 +1,143 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+
+from matrix_cache import MatrixCache
+
+# Content-addressed store of reduced lattice bases. The key is a hash of the
+# input basis and the reduction parameters, so any attack that builds the
+# same lattice again (same A, e.g. every column or every run against one
+# seedA) gets the reduced basis back without reducing. Two tiers: an
+# in-memory LRU (MatrixCache) and a directory of .npy files whose total size
+# is capped, least recently used files being deleted first.
+#
+# The disk tier is opt-in: it is used when $BASIS_CACHE_DIR is set or a CLI
+# passes --basis-cache DIR (set_cache_dir); otherwise the cache is in memory
+# only.
+
+DEFAULT_DIR = os.path.join(os.path.expanduser("~"), ".cache", "lattice-bases")
+
+
+def _int_array(basis):
+    rows = [[int(x) for x in row] for row in basis]
+    try:
+        return np.array(rows, dtype=np.int64).reshape(len(rows), -1)
+    except OverflowError:
+        return None
+
+
+def basis_key(basis, algorithm, **params):
+    h = hashlib.sha256()
+    h.update(json.dumps([algorithm, params], sort_keys=True).encode())
+    h.update(f"{basis.nrows()}x{basis.ncols()}:".encode())
+    for row in basis:
+        h.update(",".join(str(int(x)) for x in row).encode())
+        h.update(b";")
+    return h.hexdigest()
+
+
+class BasisStore:
+    def __init__(self, directory=None, max_entries=16, max_bytes=256 << 20, max_disk_bytes=1 << 30):
+        if directory is None:
+            directory = os.environ.get("BASIS_CACHE_DIR")
+        self.directory = directory or None
+        self.max_disk_bytes = max_disk_bytes
+        self.memory = MatrixCache(max_entries, max_bytes)
+        self.disk_hits = 0
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + ".npy")
+
+    def _load(self, key):
+        if not self.directory:
+            return None
+        path = self._path(key)
+        try:
+            arr = np.load(path)
+            os.utime(path)  # mark as recently used for the disk LRU
+        except (OSError, ValueError):
+            # Missing, or evicted by another process while we read it.
+            return None
+        from sage.matrix.constructor import matrix as Matrix
+        from sage.rings.integer_ring import ZZ
+        return Matrix(ZZ, arr.tolist())
+
+    def _save(self, key, basis):
+        if not self.directory:
+            return
+        arr = _int_array(basis)
+        if arr is None or arr.nbytes > self.max_disk_bytes:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        tmp = self._path(key) + f".{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            np.save(f, arr)
+        os.replace(tmp, self._path(key))
+        self._evict_disk()
+
+    def _evict_disk(self):
+        files = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".npy"):
+                path = os.path.join(self.directory, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue  # removed by a concurrent process
+                files.append((st.st_mtime, st.st_size, path))
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.max_disk_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total -= size
+
+    def get(self, key):
+        basis = self.memory.get(key)
+        if basis is None:
+            basis = self._load(key)
+            if basis is not None:
+                self.disk_hits += 1
+                basis = self.memory.put(key, basis)
+        return basis
+
+    def put(self, key, basis):
+        basis = self.memory.put(key, basis)
+        self._save(key, basis)
+        return basis
+
+    def get_or_reduce(self, basis, reduce, algorithm, **params):
+        """
+        Reduced form of basis: from the cache if this basis was reduced
+        with the same algorithm/params before, otherwise reduce(basis),
+        which is stored in both tiers. Returned matrices are immutable.
+        """
+        key = basis_key(basis, algorithm, **params)
+        reduced = self.get(key)
+        if reduced is None:
+            reduced = self.put(key, reduce(basis))
+        return reduced
+
+    def clear(self, disk=False):
+        self.memory.clear()
+        self.disk_hits = 0
+        if disk and self.directory and os.path.isdir(self.directory):
+            for name in os.listdir(self.directory):
+                if name.endswith(".npy"):
+                    os.remove(os.path.join(self.directory, name))
+
+    def stats(self):
+        return dict(self.memory.stats(), disk_hits=self.disk_hits, directory=self.directory)
+
+
+basis_store = BasisStore()
+
+
+def set_cache_dir(path):
+    # Turn the disk tier of the global store on (or off, with None).
+    basis_store.directory = path or None
@@ -0,0 +1,212 @@
+import argparse
+import csv
+import itertools
+import json
+import random
+import resource
+import time
+from sage.all import set_random_seed
+
+import primal_attack
+import babai_algorithm
+import arora_ge
+import FrodoKEM_attack
+from timing import phase, record_phases
+from sweep import run_forked
+
+PHASES = ["instance", "construction", "reduction", "cvp", "groebner", "solve"]
+
+# One grid per attack; every combination of the listed values is a run. A
+# list of grids runs each of them.
+DEFAULT_GRIDS = {
+    "primal": {"n": [60], "q": [65537], "m": [270, 300, 360]},
+    "babai": {"n": [10], "q": [65537], "m": [15], "p": [257]},
+    "arora_ge": [
+        {"n": [15], "q": [65537], "m": [150, 120, 60, 30]},
+        # m >= C(n+3, 3): solved by linearization.
+        {"n": [15], "q": [65537], "m": [900]},
+        {"n": [20], "q": [65537], "m": [1800]},
+    ],
+    "frodo": {"multi_target": [True], "workers": [1]},
+}
+# Dimensions of the frodo runs, recorded with every frodo record so the
+# estimator can be calibrated on them.
+FRODO_PARAMS = {"n": FrodoKEM_attack.n, "q": FrodoKEM_attack.q, "m": FrodoKEM_attack.m, "nbar": FrodoKEM_attack.nbar}
+
+
+def trial_primal(params):
+    with phase("instance"):
+        s_real, A_list, b_list, q = primal_attack.generate_key(n=params["n"], q=params["q"], samples=params["m"],
+                                                               seed=random.getrandbits(64))
+    error_vector = primal_attack.recover_error(A_list, b_list, q)
+    s_recovered = primal_attack.recover_secret(A_list, b_list, q, error_vector)
+    return all((int(a) - int(b)) % q == 0 for a, b in zip(s_real, s_recovered))
+
+
+def trial_babai(params):
+    n, q = params["n"], params["q"]
+    with phase("instance"):
+        A, S_real, B = babai_algorithm.lwe_generate_instance(n, q, params["m"], params.get("p", 257),
+                                                             params.get("E", [-3, 0, 3]))
+    recovered = babai_algorithm.lwe_babai_attack(A, B, q)
+    return recovered is not None and all((recovered[i] - S_real[i]) % q == 0 for i in range(n))
+
+
+def trial_arora_ge(params):
+    n, q, E = params["n"], params["q"], params.get("E", [-1, 0, 1])
+    with phase("instance"):
+        s_real, A, b = arora_ge.generate_instance(n, q, params["m"], E)
+    recovered = arora_ge.arora_ge_attack(q, A, b, E, solver=params.get("solver", "auto"))
+    return recovered is not None and len(recovered) == n and all((recovered[i] - s_real[i]) % q == 0 for i in range(n))
+
+
+def trial_frodo(params):
+    # FrodoKEM_attack uses its module-level n, m; the grid only varies how
+    # the attack is run.
+    with phase("instance"):
+        pk, sk = FrodoKEM_attack.frodokem_keygen()
+    test_sk = FrodoKEM_attack.crack(pk, workers=params.get("workers", 1))
+    ct, ss1, _ = FrodoKEM_attack.frodokem_encapsulate(pk)
+    _, ss2 = FrodoKEM_attack.frodokem_decapsulate(pk, test_sk, ct)
+    return ss1 == ss2
+
+
+TRIALS = {
+    "primal": trial_primal,
+    "babai": trial_babai,
+    "arora_ge": trial_arora_ge,
+    "frodo": trial_frodo,
+}
+
+
+def expand_grid(grid):
+    if isinstance(grid, list):
+        return [params for g in grid for params in expand_grid(g)]
+    keys = list(grid)
+    return [dict(zip(keys, values)) for values in itertools.product(*(grid[k] for k in keys))]
+
+
+def run_trial(attack, params, seed):
+    random.seed(seed)
+    set_random_seed(seed)
+    record = {"attack": attack, "params": dict(params), "seed": seed, "error": ""}
+    if attack == "frodo":
+        record["params"].update(FRODO_PARAMS)
+    with record_phases() as timings:
+        start = time.perf_counter()
+        try:
+            record["success"] = bool(TRIALS[attack](params))
+        except Exception as e:
+            record["success"] = False
+            record["error"] = repr(e)
+        record["total_time"] = time.perf_counter() - start
+    for name in PHASES:
+        record[f"{name}_time"] = timings.get(name, 0.0)
+    # High-water mark (KiB on Linux) of the process running the trial, which
+    # run_benchmarks forks for every trial.
+    record["peak_rss_kb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return record
+
+
+def run_trial_forked(attack, params, seed):
+    # run_trial in its own process, so peak_rss_kb is this trial's peak and
+    # not the largest of all the trials before it.
+    start = time.perf_counter()
+    status, result = run_forked(lambda point: run_trial(*point), (attack, params, seed))
+    if status == "ok":
+        return result
+    record = {"attack": attack, "params": dict(params), "seed": seed, "success": False,
+              "error": f"{status}: {result}", "total_time": time.perf_counter() - start, "peak_rss_kb": None}
+    if attack == "frodo":
+        record["params"].update(FRODO_PARAMS)
+    for name in PHASES:
+        record[f"{name}_time"] = 0.0
+    return record
+
+
+def run_benchmarks(grids, trials=1, seed=0):
+    records = []
+    for attack, grid in grids.items():
+        for params in expand_grid(grid):
+            for t in range(trials):
+                record = run_trial_forked(attack, params, seed + t)
+                record["trial"] = t
+                records.append(record)
+                status = "ok" if record["success"] else f"FAIL {record['error']}"
+                print(f"[{attack}] {params} trial={t} {record['total_time']:.2f}s {status}", flush=True)
+    return records
+
+
+def summarize(records):
+    groups = {}
+    for r in records:
+        key = (r["attack"], json.dumps(r["params"], sort_keys=True))
+        groups.setdefault(key, []).append(r)
+    summary = []
+    for (attack, params), rs in groups.items():
+        row = {
+            "attack": attack,
+            "params": json.loads(params),
+            "trials": len(rs),
+            "success_rate": sum(r["success"] for r in rs) / len(rs),
+            "mean_total_time": sum(r["total_time"] for r in rs) / len(rs),
+            "peak_rss_kb": max((r["peak_rss_kb"] for r in rs if r["peak_rss_kb"] is not None), default=None),
+        }
+        for name in PHASES:
+            row[f"mean_{name}_time"] = sum(r[f"{name}_time"] for r in rs) / len(rs)
+        summary.append(row)
+    return summary
+
+
+def flatten(record):
+    row = {k: v for k, v in record.items() if k != "params"}
+    for k, v in record["params"].items():
+        row[f"param_{k}"] = json.dumps(v) if isinstance(v, (list, dict)) else v
+    return row
+
+
+def write_json(path, records):
+    with open(path, "w") as f:
+        json.dump({"records": records, "summary": summarize(records)}, f, indent=2)
+
+
+def write_csv(path, records):
+    rows = [flatten(r) for r in records]
+    fields = []
+    for row in rows:
+        fields += [k for k in row if k not in fields]
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=fields)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the LWE attacks over parameter grids")
+    parser.add_argument("attacks", nargs="*", choices=sorted(TRIALS), help="attacks to run (default: all)")
+    parser.add_argument("--grid", help="JSON file mapping attack name to {param: [values]}")
+    parser.add_argument("--trials", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", dest="json_path")
+    parser.add_argument("--csv", dest="csv_path")
+    args = parser.parse_args()
+
+    grids = dict(DEFAULT_GRIDS)
+    if args.grid:
+        with open(args.grid) as f:
+            grids.update(json.load(f))
+    attacks = args.attacks or list(grids)
+    records = run_benchmarks({a: grids[a] for a in attacks}, trials=args.trials, seed=args.seed)
+
+    print("\nSummary:")
+    for row in summarize(records):
+        print(f"{row['attack']} {row['params']} → success={row['success_rate']:.0%} | "
+              f"mean time={row['mean_total_time']:.2f}s | peak RSS={row['peak_rss_kb']} KiB")
+    if args.json_path:
+        write_json(args.json_path, records)
+    if args.csv_path:
+        write_csv(args.csv_path, records)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+import argparse
+import json
+import math
+import os
+import sys
+import time
+from itertools import repeat
+from multiprocessing import Pool
+from statistics import NormalDist
+
+import numpy as np
+
+# Monte Carlo decryption-failure rate of the toy FrodoKEM parameter sets.
+#
+# Decapsulation computes C2 - C1 S = S'(AS + E) + E'' + enc(mu) - (S'A + E')S
+# = enc(mu) + S'E - E'S + E'', so A cancels and a trial only needs the error
+# matrices S, E (keygen) and S', E', E'' (encaps). A message symbol is
+# encoded as a multiple of q/4 and decoded by rounding, so it is lost once
+# the noise reaches q/8 in absolute value (at exactly q/8 rounding is a tie;
+# counted as a failure). Trials run in batches of independent keys and
+# ciphertexts as stacked matrix products, batches are spread over a process
+# pool and only per-batch counts are kept, so memory does not grow with the
+# number of trials.
+
+DEFAULT_BATCH = 1024
+
+
+def parameter_sets():
+    import FrodoKEM
+    import FrodoKEM_attack
+    import attack_FrodoKEM_primal
+    sets = {}
+    for name, mod in [("FrodoKEM", FrodoKEM), ("FrodoKEM_attack", FrodoKEM_attack),
+                      ("attack_FrodoKEM_primal", attack_FrodoKEM_primal)]:
+        sets[name] = {"n": mod.n, "m": getattr(mod, "m", mod.n), "nbar": mod.nbar, "q": mod.q,
+                      "sampler": mod.error_sampler}
+    return sets
+
+
+def sample_noise(params, trials):
+    # (trials, nbar, nbar) decryption noise S'E - E'S + E'', centered mod q.
+    n, m, nbar, q = params["n"], params["m"], params["nbar"], params["q"]
+    sample = params["sampler"].sample
+    S = sample(trials * n * nbar).reshape(trials, n, nbar)
+    E = sample(trials * m * nbar).reshape(trials, m, nbar)
+    Sp = sample(trials * nbar * m).reshape(trials, nbar, m)
+    Ep = sample(trials * nbar * n).reshape(trials, nbar, n)
+    Epp = sample(trials * nbar * nbar).reshape(trials, nbar, nbar)
+    noise = (Sp @ E - Ep @ S + Epp) % q
+    return np.where(noise > q // 2, noise - q, noise)
+
+
+def run_batch(params, trials=DEFAULT_BATCH):
+    noise = np.abs(sample_noise(params, trials))
+    failed = noise >= params["q"] // 8
+    return {
+        "trials": trials,
+        "failures": int(failed.any(axis=(1, 2)).sum()),
+        "symbols": int(failed.size),
+        "symbol_failures": int(failed.sum()),
+        "max_noise": int(noise.max()),
+    }
+
+
+def wilson_interval(failures, trials, confidence=0.95):
+    if trials == 0:
+        return 0.0, 1.0
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+    p = failures / trials
+    denom = 1 + z * z / trials
+    center = (p + z * z / (2 * trials)) / denom
+    half = z * math.sqrt(p * (1 - p) / trials + z * z / (4 * trials * trials)) / denom
+    lo = 0.0 if failures == 0 else max(0.0, center - half)
+    hi = 1.0 if failures == trials else min(1.0, center + half)
+    return lo, hi
+
+
+def _run_batch(args):
+    return run_batch(*args)
+
+
+def simulate(params, trials, batch=DEFAULT_BATCH, workers=None, confidence=0.95, on_batch=None):
+    """
+    Run `trials` keygen -> encaps -> decaps trials of one parameter set.
+    on_batch(totals) is called after every finished batch with the running
+    totals, which are also returned at the end: trials, failures, rate and
+    its Wilson confidence interval, and the same per message symbol.
+    """
+    sizes = [batch] * (trials // batch) + ([trials % batch] if trials % batch else [])
+    totals = {"trials": 0, "failures": 0, "symbols": 0, "symbol_failures": 0, "max_noise": 0}
+    start = time.time()
+    with Pool(workers or os.cpu_count()) as pool:
+        for result in pool.imap_unordered(_run_batch, zip(repeat(params), sizes)):
+            for key in ("trials", "failures", "symbols", "symbol_failures"):
+                totals[key] += result[key]
+            totals["max_noise"] = max(totals["max_noise"], result["max_noise"])
+            totals["rate"] = totals["failures"] / totals["trials"]
+            totals["ci"] = wilson_interval(totals["failures"], totals["trials"], confidence)
+            totals["symbol_rate"] = totals["symbol_failures"] / totals["symbols"]
+            totals["symbol_ci"] = wilson_interval(totals["symbol_failures"], totals["symbols"], confidence)
+            totals["elapsed"] = time.time() - start
+            if on_batch:
+                on_batch(totals)
+    return totals
+
+
+def main():
+    sets = parameter_sets()
+    parser = argparse.ArgumentParser(description="Monte Carlo decryption-failure rate of the FrodoKEM toy parameters")
+    parser.add_argument("sets", nargs="*", help=f"parameter sets (default: all of {', '.join(sorted(sets))})")
+    parser.add_argument("--trials", type=int, default=1_000_000)
+    parser.add_argument("--batch", type=int, default=DEFAULT_BATCH, help="trials per vectorized batch")
+    parser.add_argument("--jobs", type=int, help="worker processes (default: all cores)")
+    parser.add_argument("--confidence", type=float, default=0.95)
+    parser.add_argument("--jsonl", help="append running totals after every batch to this file")
+    args = parser.parse_args()
+    unknown = [name for name in args.sets if name not in sets]
+    if unknown:
+        parser.error(f"unknown parameter set(s): {', '.join(unknown)}")
+
+    out = open(args.jsonl, "a") if args.jsonl else None
+    try:
+        for name in args.sets or sorted(sets):
+            params = sets[name]
+            def report(totals):
+                if out:
+                    out.write(json.dumps(dict(totals, set=name)) + "\n")
+                    out.flush()
+                lo, hi = totals["ci"]
+                print(f"\r{name}: {totals['trials']}/{args.trials} trials, {totals['failures']} failures, "
+                      f"rate {totals['rate']:.3g} [{lo:.3g}, {hi:.3g}]", end="", file=sys.stderr, flush=True)
+            totals = simulate(params, args.trials, args.batch, args.jobs, args.confidence, report)
+            print(file=sys.stderr)
+            lo, hi = totals["ci"]
+            slo, shi = totals["symbol_ci"]
+            print(f"{name} (n={params['n']}, m={params['m']}, nbar={params['nbar']}, q={params['q']}): "
+                  f"DFR {totals['rate']:.3g} [{lo:.3g}, {hi:.3g}], "
+                  f"per symbol {totals['symbol_rate']:.3g} [{slo:.3g}, {shi:.3g}], "
+                  f"max |noise| {totals['max_noise']} (limit {params['q'] // 8}), "
+                  f"{totals['trials'] / totals['elapsed']:.0f} trials/s")
+    finally:
+        if out:
+            out.close()
+
+
+if __name__ == "__main__":
+    main()
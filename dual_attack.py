@@ -0,0 +1,126 @@
+from itertools import product
+import math
+
+import numpy as np
+
+from basis_cache import basis_store
+from reduction import bkz_reduce, lll_reduce
+from timing import phase
+
+# Dual attack. A short w in the dual lattice {w : w^T A = 0 mod q} turns a
+# sample column b = A s + e into <w, b> = <w, e> (mod q), which is small when
+# w and e are, whereas for uniform b it is uniform mod q. Each target is
+# scored by the mean of cos(2 pi <w, b> / q) over many dual vectors: close to
+# exp(-2 pi^2 sigma^2 |w|^2 / q^2) for LWE, 0 +- 1/sqrt(2N) for uniform.
+#
+# The dual lattice only depends on A, so it is reduced once and its short
+# vectors are reused for every column of B and every key sharing seedA;
+# scoring all targets is one matrix product W B.
+#
+# Key recovery guesses a block G of secret coordinates: with the dual of the
+# remaining columns A_R, W (b - A_G g) = W e for the right guess g, and
+# uniform otherwise. W b and W A_G are computed once, so all guesses for all
+# columns are scored together.
+
+DEFAULT_VECTORS = 512
+HARVEST_BASE = 48
+
+
+def reduce_dual(A_list, q, blocksize=None):
+    # Reduced basis of the dual q-ary lattice of A (LLL, or BKZ-blocksize
+    # after LLL), cached like the primal q-ary bases.
+    from lattice_construction import dual_basis
+    with phase("construction"):
+        D = dual_basis(A_list, q)
+    if blocksize is None:
+        return basis_store.get_or_reduce(D, lll_reduce, "LLL")
+    return basis_store.get_or_reduce(D, lambda M: bkz_reduce(M, blocksize), "BKZ", block_size=blocksize)
+
+
+def harvest(L, q, count=DEFAULT_VECTORS):
+    """
+    Up to `count` short dual vectors from the reduced basis L: its rows
+    plus the sums and differences of its HARVEST_BASE shortest rows,
+    shortest first, as an int64 array. Vectors of norm >= q carry no
+    information and are dropped.
+    """
+    W = np.array([[int(x) for x in row] for row in L], dtype=np.int64)
+    norms = np.linalg.norm(W, axis=1)
+    W = W[np.argsort(norms)]
+    base = W[:HARVEST_BASE]
+    i, j = np.triu_indices(len(base), 1)
+    W = np.unique(np.vstack([W, base[i] + base[j], base[i] - base[j]]), axis=0)
+    # w and -w give the same score.
+    first = W[np.arange(len(W)), np.argmax(W != 0, axis=1)]
+    W = W[first > 0]
+    norms = np.linalg.norm(W, axis=1)
+    W = W[norms < q]
+    return W[np.argsort(np.linalg.norm(W, axis=1), kind="stable")][:count]
+
+
+def scores(W, B, q):
+    # Mean cos(2 pi <w, b> / q) over the rows of W, for every column of B
+    # (or a single vector B).
+    B = np.asarray(B, dtype=np.int64) % q
+    X = (W @ B) % q
+    return np.cos(2 * np.pi * X / q).mean(axis=0)
+
+
+def distinguish(W, B, q, threshold=None):
+    """
+    True for the columns of B that look like LWE samples for the A that W
+    was harvested from, False for those that look uniform. The default
+    threshold is four standard deviations of the uniform score.
+    """
+    if threshold is None:
+        threshold = 4 * math.sqrt(0.5 / len(W))
+    return scores(W, B, q) > threshold
+
+
+def guess_block(A, B, q, W, block, values):
+    """
+    Best guess of the secret coordinates `block` for every column of B,
+    with W harvested from the dual of A without those columns. Returns a
+    len(block) x columns array of entries of `values` and the scores of
+    the chosen guesses.
+    """
+    A = np.asarray(A, dtype=np.int64) % q
+    B = np.asarray(B, dtype=np.int64) % q
+    guesses = np.array(list(product(values, repeat=len(block))), dtype=np.int64)
+    WB = W @ B % q
+    WA = W @ A[:, block] % q
+    shift = WA @ guesses.T % q
+    X = (WB[:, :, None] - shift[:, None, :]) % q
+    S = np.cos(2 * np.pi * X / q).mean(axis=0)
+    best = np.argmax(S, axis=1)
+    return guesses[best].T, S[np.arange(len(best)), best]
+
+
+def recover_secrets(A_list, b_cols, q, values, block_size=2, count=DEFAULT_VECTORS, blocksize=None, threshold=None):
+    """
+    Secrets of all columns b_j = A s_j + e_j (mod q) by guessing
+    block_size coordinates at a time from `values`. Each block costs one
+    reduction of the dual lattice of A without its columns, shared by all
+    columns. Returns the secrets as lists of (centered) ints; raises
+    ValueError if the best guess of a block does not stand out from
+    uniform for some column.
+    """
+    A = np.asarray(A_list, dtype=np.int64) % q
+    B = np.asarray(b_cols, dtype=np.int64).T % q
+    n = A.shape[1]
+    S = np.zeros((n, B.shape[1]), dtype=np.int64)
+    for start in range(0, n, block_size):
+        block = list(range(start, min(start + block_size, n)))
+        rest = [j for j in range(n) if j not in block]
+        L = reduce_dual(A[:, rest].tolist(), q, blocksize)
+        W = harvest(L, q, count)
+        if len(W) == 0:
+            raise ValueError(f"No dual vectors shorter than q for coordinates {block}")
+        with phase("solve"):
+            S[block], best = guess_block(A, B, q, W, block, values)
+        limit = 4 * math.sqrt(0.5 / len(W)) if threshold is None else threshold
+        weak = np.nonzero(best <= limit)[0]
+        if weak.size:
+            raise ValueError(f"No guess for coordinates {block} of column(s) "
+                             f"{', '.join(map(str, weak))} beats uniform")
+    return [[int(x) for x in S[:, j]] for j in range(S.shape[1])]
@@ -0,0 +1,188 @@
+import json
+import math
+from collections import defaultdict
+
+from sample_planner import PLAN_BLOCKSIZES, success_probability, uniform_sigma
+
+# Feasibility / runtime estimates for the attacks, computed before any
+# reduction is started.
+#
+# Primal embedding and Babai: success probability of nearest-plane decoding
+# on a reduced q-ary basis (see sample_planner), evaluated for LLL and the
+# BKZ ladder; the required block size is the first one reaching `target`.
+# Arora-Ge: the system has C(n+d, d) monomials for |E| = d; it is solvable
+# by linearization once m >= C(n+d, d) - 1, otherwise it needs a Groebner
+# basis whose cost we do not model.
+#
+# Wall time is exp(a) * dim^b * BKZ_COST_BASE^(beta-2), with (a, b) per
+# attack fitted from benchmark.py JSON results by Calibration (the CLIs'
+# --calibration); the defaults are rough figures for Sage/fpLLL on a laptop.
+# FrodoKEM runs use the primal model times the column cost until benchmark
+# records for them are fitted.
+
+DEFAULT_TIME_MODEL = {
+    "primal": (-16.0, 3.5),
+    "babai": (-16.0, 3.5),
+    "arora_ge": (-14.0, 2.5),
+}
+BKZ_COST_BASE = 2 ** 0.25
+# In multi-target mode, each of the nbar columns re-reduces an almost
+# reduced basis; count it as a quarter of the shared reduction.
+COLUMN_COST = 0.25
+
+
+class InfeasibleAttack(ValueError):
+    pass
+
+
+def sigma_of(bound=None, sigma=None, values=None):
+    if sigma is not None:
+        return sigma
+    if values is not None:
+        mean = sum(values) / len(values)
+        return math.sqrt(sum((v - mean) ** 2 for v in values) / len(values))
+    return uniform_sigma(bound)
+
+
+def arora_ge_monomials(n, degree):
+    return math.comb(n + degree, degree)
+
+
+class Calibration:
+    def __init__(self, model=None):
+        self.model = dict(DEFAULT_TIME_MODEL if model is None else model)
+
+    @classmethod
+    def from_benchmarks(cls, paths):
+        # Least-squares fit of log(time) = a + b*log(dim) per attack over the
+        # records of one or more benchmark.py --json files.
+        points = defaultdict(list)
+        for path in [paths] if isinstance(paths, str) else paths:
+            with open(path) as f:
+                for r in json.load(f)["records"]:
+                    dim = record_dimension(r)
+                    if dim and r.get("total_time", 0) > 0:
+                        points[r["attack"]].append((math.log(dim), math.log(r["total_time"])))
+        model = dict(DEFAULT_TIME_MODEL)
+        for attack, xy in points.items():
+            a, b = model.get(attack, DEFAULT_TIME_MODEL["primal"])
+            xs = [x for x, _ in xy]
+            mean_x = sum(xs) / len(xs)
+            mean_y = sum(y for _, y in xy) / len(xy)
+            var_x = sum((x - mean_x) ** 2 for x in xs)
+            if var_x > 1e-9:
+                b = sum((x - mean_x) * (y - mean_y) for x, y in xy) / var_x
+            # With a single dimension only the scale can be fitted.
+            model[attack] = (mean_y - b * mean_x, b)
+        return cls(model)
+
+    def seconds(self, attack, dim, beta=None):
+        a, b = self.model.get(attack, DEFAULT_TIME_MODEL["primal"])
+        t = math.exp(a) * dim ** b
+        if beta is not None:
+            t *= BKZ_COST_BASE ** (beta - 2)
+        return t
+
+
+def load_calibration(paths):
+    # Calibration fitted from benchmark.py --json files, or None (defaults).
+    return Calibration.from_benchmarks(paths) if paths else None
+
+
+def add_policy_arguments(parser):
+    parser.add_argument("--policy", choices=["refuse", "downgrade"], help="what to do when the estimator predicts failure")
+    parser.add_argument("--max-seconds", type=float, help="treat jobs estimated to take longer as hopeless")
+    parser.add_argument("--calibration", metavar="JSON", action="append",
+                        help="benchmark.py --json results to fit the time model to (repeatable)")
+
+
+def record_dimension(record):
+    p = record.get("params", {})
+    if "m" not in p:
+        return None
+    if record["attack"] in ("primal", "frodo"):
+        return p["m"] + 1
+    if record["attack"] == "babai":
+        return p["m"]
+    if record["attack"] == "arora_ge":
+        return arora_ge_monomials(p["n"], len(p.get("E", [-1, 0, 1])))
+    return None
+
+
+def _lattice_estimate(attack, n, q, m, sigma, dim, calibration, target, blocksizes):
+    best = None
+    for beta in blocksizes:
+        p = success_probability(n, q, m, sigma, beta)
+        if best is None or p > best[1] or p >= target:
+            best = (beta, p)
+        if p >= target:
+            break
+    beta, p = best
+    return {
+        "attack": attack,
+        "dimension": dim,
+        "blocksize": beta,
+        "success_probability": p,
+        "feasible": p >= target,
+        "seconds": calibration.seconds(attack, dim, beta),
+    }
+
+
+def estimate_primal(n, q, m, bound=None, sigma=None, calibration=None, target=0.9, blocksizes=PLAN_BLOCKSIZES):
+    return _lattice_estimate("primal", n, q, m, sigma_of(bound, sigma), m + 1,
+                             calibration or Calibration(), target, blocksizes)
+
+
+def estimate_frodo(n, q, m, nbar, bound=None, sigma=None, calibration=None, target=0.9, blocksizes=PLAN_BLOCKSIZES):
+    calibration = calibration or Calibration()
+    est = estimate_primal(n, q, m, bound, sigma, calibration, target, blocksizes)
+    est["attack"] = "frodo"
+    # All nbar columns must succeed.
+    est["success_probability"] = est["success_probability"] ** nbar
+    est["feasible"] = est["success_probability"] >= target
+    if "frodo" in calibration.model:
+        # Fitted on whole FrodoKEM attacks, all columns included.
+        est["seconds"] = calibration.seconds("frodo", est["dimension"], est["blocksize"])
+    else:
+        est["seconds"] *= 1 + COLUMN_COST * nbar
+    return est
+
+
+def estimate_babai(n, q, m, values=None, sigma=None, calibration=None, target=0.9):
+    # lwe_babai_attack only runs LLL.
+    return _lattice_estimate("babai", n, q, m, sigma_of(sigma=sigma, values=values), m,
+                             calibration or Calibration(), target, (None,))
+
+
+def estimate_arora_ge(n, q, m, E, calibration=None):
+    monomials = arora_ge_monomials(n, len(E))
+    linear = m >= monomials - 1
+    return {
+        "attack": "arora_ge",
+        "dimension": monomials,
+        "blocksize": None,
+        "success_probability": 1.0 if linear else None,
+        "feasible": linear,
+        "seconds": (calibration or Calibration()).seconds("arora_ge", monomials),
+    }
+
+
+def enforce(estimate, policy=None, max_seconds=None):
+    """
+    Apply a launch policy to an estimate. policy None runs everything,
+    "refuse" raises InfeasibleAttack for hopeless jobs and "downgrade"
+    returns "downgrade" so the caller can fall back to a cheaper
+    configuration; otherwise returns "run".
+    """
+    hopeless = not estimate["feasible"] or (max_seconds is not None and estimate["seconds"] > max_seconds)
+    if policy is None or not hopeless:
+        return "run"
+    if policy == "refuse":
+        p = estimate["success_probability"]
+        raise InfeasibleAttack(
+            f"{estimate['attack']} attack refused: dimension {estimate['dimension']}, "
+            f"success probability {'unknown' if p is None else f'{p:.3g}'}, "
+            f"estimated {estimate['seconds']:.3g}s")
+    if policy == "downgrade":
+        return "downgrade"
+    raise ValueError(f"Unknown policy {policy!r}")
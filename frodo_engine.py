@@ -0,0 +1,147 @@
+import importlib.util
+import os
+import sys
+from array import array
+import numpy as np
+
+# Arithmetic backends for the FrodoKEM modules. "sage" keeps the original
+# Matrix(ZZ) + apply_map code path, "numpy" does the same products on int64
+# arrays and reduces mod q with a mask (q is a power of two), which gives
+# bit-identical pk/ct/ss. Select per call with engine="numpy" or globally
+# with set_default_engine() / the FRODO_ENGINE environment variable.
+# Sage is only imported when the sage engine is first used.
+
+
+class SageRequired(ImportError):
+    pass
+
+
+class SageEngine:
+    name = "sage"
+
+    def __init__(self):
+        # The two submodules needed for integer matrices, not sage.all.
+        from sage.matrix.constructor import matrix
+        from sage.rings.integer_ring import ZZ
+        self.Matrix = matrix
+        self.ZZ = ZZ
+
+    def matrix(self, rows, cols, vals):
+        if isinstance(vals, np.ndarray):
+            vals = vals.tolist()
+        return self.Matrix(self.ZZ, rows, cols, vals)
+
+    def convert(self, M):
+        if isinstance(M, np.ndarray):
+            return self.Matrix(self.ZZ, M.shape[0], M.shape[1], M.ravel().tolist())
+        return M
+
+    def from_u16(self, buf, rows, cols, mask=0xffff):
+        vals = u16_values(buf, rows * cols)
+        if mask != 0xffff:
+            vals = [v & mask for v in vals]
+        return self.Matrix(self.ZZ, rows, cols, vals)
+
+    def stack(self, mats):
+        return self.Matrix(self.ZZ, sum(M.nrows() for M in mats), mats[0].ncols(),
+                           [x for M in mats for x in M.list()])
+
+    def mul(self, X, Y):
+        return X * Y
+
+    def mod(self, M, q):
+        return M.apply_map(lambda x: x % q)
+
+
+class NumpyEngine:
+    name = "numpy"
+
+    def matrix(self, rows, cols, vals):
+        return np.array(vals, dtype=np.int64).reshape(rows, cols)
+
+    def convert(self, M):
+        if isinstance(M, np.ndarray):
+            return M.astype(np.int64, copy=False)
+        return np.array(M.list(), dtype=np.int64).reshape(M.nrows(), M.ncols())
+
+    def from_u16(self, buf, rows, cols, mask=0xffff):
+        vals = np.frombuffer(buf, dtype='<u2', count=rows*cols).astype(np.int64)
+        return (vals & mask).reshape(rows, cols)
+
+    def stack(self, mats):
+        return np.vstack(mats)
+
+    def mul(self, X, Y):
+        return X @ Y
+
+    def mod(self, M, q):
+        if q & (q - 1) == 0:
+            return M & (q - 1)
+        return M % q
+
+
+ENGINES = {"sage": SageEngine, "numpy": NumpyEngine}
+_instances = {}
+
+
+def sage_available():
+    return importlib.util.find_spec("sage") is not None
+
+
+# Without Sage the numpy engine is the default, so the KEM itself runs on a
+# plain Python + NumPy install.
+_default = os.environ.get("FRODO_ENGINE") or ("sage" if sage_available() else "numpy")
+
+
+def set_default_engine(name):
+    global _default
+    if name not in ENGINES:
+        raise ValueError(f"Unknown engine {name!r}, expected one of {sorted(ENGINES)}")
+    _default = name
+
+
+def get_engine(name=None):
+    name = _default if name is None else name
+    if name not in ENGINES:
+        raise ValueError(f"Unknown engine {name!r}, expected one of {sorted(ENGINES)}")
+    if name not in _instances:
+        try:
+            _instances[name] = ENGINES[name]()
+        except ImportError as e:
+            raise SageRequired("this command requires SageMath "
+                               "(use --engine numpy for keygen/encaps/decaps)") from e
+    return _instances[name]
+
+
+def entries(M):
+    if isinstance(M, np.ndarray):
+        return M.ravel().tolist()
+    return M.list()
+
+
+# Serialization: matrices travel as row-major little-endian uint16. Decoding
+# reads the pk/ct buffer (bytes, memoryview or mmap) in place instead of
+# slicing out and converting one 2-byte chunk per entry.
+
+def u16_values(buf, count):
+    view = memoryview(buf).cast('B')[:2 * count]
+    if sys.byteorder == 'little':
+        return view.cast('H').tolist()
+    vals = array('H')
+    vals.frombytes(view)
+    vals.byteswap()
+    return vals.tolist()
+
+
+def to_u16(M, q=None):
+    if isinstance(M, np.ndarray):
+        if q is not None:
+            M = M % q
+        if M.size and (M.min() < 0 or M.max() > 0xffff):
+            raise OverflowError("matrix entry does not fit in 16 bits")
+        return M.astype('<u2', copy=False).tobytes()
+    vals = M.list() if q is None else [x % q for x in M.list()]
+    out = array('H', vals)
+    if sys.byteorder != 'little':
+        out.byteswap()
+    return out.tobytes()
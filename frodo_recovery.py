@@ -0,0 +1,124 @@
+from concurrent.futures import ProcessPoolExecutor
+
+from basis_cache import basis_store
+from frodo_engine import get_engine
+from modular_solver import solve_lwe
+from reduction import find_error_vector, lll_reduce, DEFAULT_BLOCKSIZES
+from sample_planner import resolve_samples, random_rows
+from timing import phase, timed_call, merge
+
+# Primal recovery of a FrodoKEM secret S from B = A S + E (mod q), shared by
+# the attack modules, which only differ in their parameters and in the error
+# bound (|e| <= bound) of their sampler.
+
+
+def reduce_qary_basis(A_list, q):
+    # LLL-reduced basis of the q-ary lattice {A*x mod q}; it only depends on A,
+    # so it can be shared by every column of B (multi-target embedding).
+    from lattice_construction import qary_basis
+    with phase("construction"):
+        M = qary_basis(A_list, q)
+    return basis_store.get_or_reduce(M, lll_reduce, "LLL")
+
+
+def recover_error_vector(A_list, b_list, q, bound, reduced_basis=None, blocksizes=DEFAULT_BLOCKSIZES, rows=None):
+    # rows selects the samples to embed (default: all) and must match the
+    # rows reduced_basis was built from; the other samples get None.
+    from lattice_construction import qary_embedding, kannan_embedding
+    if rows is None:
+        rows = range(len(A_list))
+    with phase("construction"):
+        b_sub = [b_list[i] for i in rows]
+        if reduced_basis is None:
+            M = qary_embedding([A_list[i] for i in rows], b_sub, q)
+        else:
+            M = kannan_embedding(reduced_basis, b_sub, q)
+    err = find_error_vector(M, q, bound, blocksizes)
+    error_vector = [None] * len(A_list)
+    for i, e in zip(rows, err):
+        error_vector[i] = e
+    return error_vector
+
+
+def recover_secret(A_list, b_list, q, error_vector):
+    with phase("solve"):
+        s = solve_lwe(A_list, [b_list], q, [error_vector])[0]
+    if s is None:
+        raise ValueError("No solution found")
+    return s
+
+
+def recover_column_error(A_list, b_list, q, bound, reduced_basis=None, rows=None, attempts=1):
+    # Error vector of one column. On failure with a sample subset, retry on a
+    # fresh random subset (which can no longer use the shared reduced basis).
+    for attempt in range(attempts):
+        try:
+            return recover_error_vector(A_list, b_list, q, bound, reduced_basis, rows=rows)
+        except ValueError:
+            if rows is None or attempt == attempts - 1:
+                raise
+            rows = random_rows(len(A_list), len(rows))
+            reduced_basis = None
+
+
+def recover_column(A_list, b_list, q, bound, reduced_basis=None, rows=None, attempts=1):
+    error_vector = recover_column_error(A_list, b_list, q, bound, reduced_basis, rows, attempts)
+    return recover_secret(A_list, b_list, q, error_vector)
+
+
+def recover_frodo_secret(A, B, q, bound, multi_target=True, workers=1, samples=None, attempts=1, sigma=None):
+    n, nbar = A.ncols(), B.ncols()
+    m = A.nrows()
+    A_list = [list(A.row(i)) for i in range(m)]
+    samples = resolve_samples(samples, n, q, m, bound, sigma)
+    rows = random_rows(m, samples) if samples else None
+    if multi_target:
+        reduced = reduce_qary_basis(A_list if rows is None else [A_list[i] for i in rows], q)
+    else:
+        reduced = None
+    b_cols = [list(B.column(col_idx)) for col_idx in range(nbar)]
+
+    error_vectors = []
+    if workers is None or workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(timed_call, recover_column_error, A_list, b_col, q, bound, reduced, rows, attempts)
+                       for b_col in b_cols]
+            for col_idx, future in enumerate(futures):
+                try:
+                    error_vector, timings = future.result()
+                except Exception as e:
+                    # Report now rather than when the running columns finish:
+                    # drop the queued ones and stop the workers, which would
+                    # otherwise still be waited for at exit.
+                    procs = list(pool._processes.values())
+                    pool.shutdown(wait=False, cancel_futures=True)
+                    for proc in procs:
+                        proc.terminate()
+                    raise ValueError(f"Recovery of column {col_idx} failed: {e!r}") from e
+                merge(timings)
+                error_vectors.append(error_vector)
+    else:
+        for col_idx, b_col in enumerate(b_cols):
+            try:
+                error_vectors.append(recover_column_error(A_list, b_col, q, bound, reduced, rows, attempts))
+            except Exception as e:
+                raise ValueError(f"Recovery of column {col_idx} failed: {e!r}") from e
+
+    # One factorisation of A for all nbar columns.
+    with phase("solve"):
+        recovered_S_cols = solve_lwe(A_list, b_cols, q, error_vectors)
+    for col_idx, s in enumerate(recovered_S_cols):
+        if s is not None:
+            continue
+        # The error vector found for this column was wrong; with a sample
+        # subset, retry the column on fresh subsets.
+        if rows is None or attempts == 1:
+            raise ValueError(f"Recovery of column {col_idx} failed: no solution found")
+        try:
+            recovered_S_cols[col_idx] = recover_column(A_list, b_cols[col_idx], q, bound, None,
+                                                       random_rows(m, len(rows)), attempts - 1)
+        except Exception as e:
+            raise ValueError(f"Recovery of column {col_idx} failed: {e!r}") from e
+
+    S = get_engine("sage").matrix(n, nbar, [s[i] for s in recovered_S_cols for i in range(n)])
+    return S
@@ -0,0 +1,136 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from itertools import product
+
+import numpy as np
+
+from basis_cache import basis_store
+from modular_solver import factor, _matmul_mod
+from nearest_plane import NearestPlane
+from reduction import bkz_reduce, lll_reduce
+from timing import phase
+
+# Hybrid guess-and-reduce attack. With the last k secret coordinates s_G
+# guessed as g, b - A_G g = A_R s_R + e is an LWE instance in n - k unknowns,
+# whose q-ary lattice {A_R x mod q} is denser and easier to reduce than the
+# full one. It only depends on A, so it is reduced once; every guess (for
+# every column of B) is then a single nearest-plane decoding against it.
+#
+# A guess is accepted when the decoded error is within the error bound and
+# the resulting s_R solves A_R s_R = b - A_G g - e exactly and lies in the
+# secret support. Guesses are tried in chunks, smallest norm first (the most
+# likely ones for a centered distribution), spread over a process pool, and
+# the search stops as soon as every column has a verified guess.
+
+DEFAULT_CHUNK = 256
+
+_state = {}
+
+
+def guesses(values, k):
+    # All k-tuples of values, smallest squared norm first.
+    tuples = list(product(values, repeat=k))
+    G = np.array(tuples, dtype=np.int64).reshape(len(tuples), k)
+    return G[np.argsort((G * G).sum(axis=1), kind="stable")]
+
+
+def reduce_partial(A_list, q, k, blocksize=None):
+    # Reduced basis of the q-ary lattice of A without its last k columns.
+    from lattice_construction import qary_basis
+    A_R = [list(row[:len(row) - k]) for row in A_list]
+    with phase("construction"):
+        M = qary_basis(A_R, q)
+    if blocksize is None:
+        return basis_store.get_or_reduce(M, lll_reduce, "LLL")
+    return basis_store.get_or_reduce(M, lambda L: bkz_reduce(L, blocksize), "BKZ", block_size=blocksize)
+
+
+def _init_worker(basis, A_R, A_G, q, bound, support):
+    rows, inverse = factor(A_R, q)
+    _state.update(decoder=NearestPlane(basis), A_R=A_R, A_G=A_G, rows=rows, inverse=inverse,
+                  q=q, bound=bound, support=support)
+
+
+def _test_chunk(B, G):
+    # Verified guesses among the rows of G for the columns of B, as
+    # {column: full secret}.
+    s = _state
+    q = s["q"]
+    m, cols = B.shape
+    T = ((B.T[:, None, :] - (G @ s["A_G"].T)[None, :, :]) % q).reshape(-1, m)
+    E = s["decoder"].errors(T) % q
+    E = np.where(E > q // 2, E - q, E).astype(np.int64)
+    hits = {}
+    for idx in np.nonzero(np.all(np.abs(E) <= s["bound"], axis=1))[0]:
+        col, g = divmod(int(idx), len(G))
+        if col in hits:
+            continue
+        rhs = ((T[idx] - E[idx]) % q)[:, None]
+        x = _matmul_mod(s["inverse"], rhs[s["rows"]], q)
+        if np.any(_matmul_mod(s["A_R"], x, q) != rhs):
+            continue
+        x = np.where(x[:, 0] > q // 2, x[:, 0] - q, x[:, 0])
+        lo, hi = s["support"]
+        if x.min(initial=lo) < lo or x.max(initial=hi) > hi:
+            continue
+        hits[col] = [int(v) for v in x] + [int(v) for v in G[g]]
+    return hits
+
+
+def recover_secrets(A_list, b_cols, q, values, bound, guess, workers=1, blocksize=None, chunk=DEFAULT_CHUNK):
+    """
+    Secrets of all columns b_j = A s_j + e_j (mod q), secret entries in
+    `values` and |e| <= bound, guessing the last `guess` coordinates.
+    workers=None uses all cores. Returns the secrets as lists of
+    (centered) ints; raises ValueError if no guess verifies for some
+    column.
+    """
+    A = np.asarray(A_list, dtype=np.int64) % q
+    B = np.asarray(b_cols, dtype=np.int64).T % q
+    n = A.shape[1]
+    if not 0 <= guess < n:
+        raise ValueError(f"Cannot guess {guess} of {n} coordinates")
+    reduced = reduce_partial(A.tolist(), q, guess, blocksize)
+    basis = np.array([[int(x) for x in row] for row in reduced], dtype=np.int64)
+    init = (basis, A[:, :n - guess], A[:, n - guess:], q, bound, (min(values), max(values)))
+    G = guesses(values, guess)
+    chunks = (G[i:i + chunk] for i in range(0, len(G), chunk))
+    secrets = [None] * B.shape[1]
+
+    def record(cols, hits):
+        for col, s in hits.items():
+            if secrets[cols[col]] is None:
+                secrets[cols[col]] = s
+
+    def open_columns():
+        return [j for j, s in enumerate(secrets) if s is None]
+
+    with phase("cvp"):
+        if workers == 1:
+            _init_worker(*init)
+            for Gc in chunks:
+                cols = open_columns()
+                if not cols:
+                    break
+                record(cols, _test_chunk(B[:, cols], Gc))
+        else:
+            in_flight = 2 * (workers or os.cpu_count())
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=init) as pool:
+                pending = {}
+                while open_columns():
+                    for Gc in chunks:
+                        pending[pool.submit(_test_chunk, B[:, open_columns()], Gc)] = open_columns()
+                        if len(pending) >= in_flight:
+                            break
+                    if not pending:
+                        break
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        record(pending.pop(future), future.result())
+                pool.shutdown(cancel_futures=True)
+
+    missing = open_columns()
+    if missing:
+        raise ValueError(f"No guess of the last {guess} coordinates verifies for column(s) "
+                         f"{', '.join(map(str, missing))}")
+    return secrets
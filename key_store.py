@@ -0,0 +1,46 @@
+import hashlib
+import os
+
+# Secret keys recovered by the crack attack, stored per public key so each
+# key is only attacked once. The file for a key is <dir>/<sha256(pk)>.sk and
+# holds the secret in the uint16 encoding of keygen's sk file.
+#
+# The directory defaults to $FRODO_KEY_STORE or ~/.cache/frodo-keys.
+
+DEFAULT_DIR = os.path.join(os.path.expanduser("~"), ".cache", "frodo-keys")
+
+
+def pk_hash(pk):
+    return hashlib.sha256(pk).hexdigest()
+
+
+class KeyStore:
+    def __init__(self, directory=None):
+        if directory is None:
+            directory = os.environ.get("FRODO_KEY_STORE") or DEFAULT_DIR
+        self.directory = directory
+
+    def path(self, pk):
+        return os.path.join(self.directory, pk_hash(pk) + ".sk")
+
+    def get(self, pk):
+        try:
+            with open(self.path(pk), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def put(self, pk, sk_bytes):
+        os.makedirs(self.directory, mode=0o700, exist_ok=True)
+        path = self.path(pk)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "wb") as f:
+            f.write(sk_bytes)
+        os.replace(tmp, path)
+
+    def __contains__(self, pk):
+        return os.path.exists(self.path(pk))
+
+
+key_store = KeyStore()
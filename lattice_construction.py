@@ -0,0 +1,108 @@
+from sage.matrix.constructor import matrix as Matrix
+from sage.matrix.special import identity_matrix, zero_matrix, block_matrix
+from sage.rings.integer_ring import ZZ
+from sage.rings.finite_rings.finite_field_constructor import GF
+from sage.rings.finite_rings.integer_mod_ring import Zmod
+
+# Lattice bases for the primal / CVP attacks, built in bulk.
+#
+# The q-ary lattice L_q(A) = {A*x mod q} of an m x n matrix A has rank m. If
+# the rows P of A form an invertible n x n block mod q and J are the other
+# rows, then y is in L_q(A) iff y_J = C*y_P mod q with C = A_J * A_P^-1, so
+# in the coordinate order (P, J) it has the echelon (Hermite normal form)
+# basis
+#
+#     [ I_n   C^T    ]
+#     [ 0     q*I_m-n ]
+#
+# which replaces the (n+m) x m generating set [A^T ; q*I]. The same split
+# gives the dual lattice {w : w^T A = 0 mod q} used by the dual attack.
+
+
+def _pivot_rows(A_list, q):
+    p = ZZ(q).prime_divisors()[0]
+    return list(Matrix(GF(p), A_list).transpose().pivots())
+
+
+def _pivot_split(A_list, q):
+    # (P, J, C) with A_P invertible mod q and C = A_J * A_P^-1 (None when
+    # J is empty), or None if A has no invertible n x n block mod q.
+    m = len(A_list)
+    n = len(A_list[0])
+    pivots = _pivot_rows(A_list, q) if m >= n else []
+    if len(pivots) != n:
+        return None
+    pivot_set = set(pivots)
+    rest = [i for i in range(m) if i not in pivot_set]
+    R = Zmod(q)
+    try:
+        A_P_inv = Matrix(R, [A_list[i] for i in pivots]).inverse()
+    except ZeroDivisionError:
+        return None
+    C = (Matrix(R, m - n, n, [A_list[i] for i in rest]) * A_P_inv).change_ring(ZZ) if rest else None
+    return pivots, rest, C
+
+
+def _original_order(H, order):
+    # Columns of H are in the coordinate order `order`; put them back.
+    position = {row: k for k, row in enumerate(order)}
+    return H.matrix_from_columns([position[i] for i in range(len(order))])
+
+
+def qary_basis(A_list, q):
+    m = len(A_list)
+    n = len(A_list[0])
+    split = _pivot_split(A_list, q)
+    if split is not None:
+        pivots, rest, C = split
+        if not rest:
+            return identity_matrix(ZZ, m)
+        H = block_matrix(ZZ, [[identity_matrix(ZZ, n), C.transpose()],
+                              [zero_matrix(ZZ, m - n, n), q * identity_matrix(ZZ, m - n)]],
+                         subdivide=False)
+        return _original_order(H, pivots + rest)
+
+    # A has no invertible n x n block mod q (or m < n): take the HNF of the
+    # generating set instead.
+    G = Matrix(ZZ, n, m, [[A_list[j][i] % q for j in range(m)] for i in range(n)]).stack(q * identity_matrix(ZZ, m))
+    H = G.echelon_form()
+    return H.matrix_from_rows([i for i in range(H.nrows()) if not H[i].is_zero()])
+
+
+def dual_basis(A_list, q):
+    """
+    Basis of the dual q-ary lattice {w : w^T A = 0 mod q} (rank m). In the
+    (P, J) coordinates of qary_basis, w_P = -C^T w_J mod q, so the rows are
+    [-C_j | e_j] for every non-pivot row j and [q I_n | 0].
+    """
+    m = len(A_list)
+    n = len(A_list[0])
+    split = _pivot_split(A_list, q)
+    if split is not None:
+        pivots, rest, C = split
+        if not rest:
+            return q * identity_matrix(ZZ, m)
+        H = block_matrix(ZZ, [[-C, identity_matrix(ZZ, m - n)],
+                              [q * identity_matrix(ZZ, n), zero_matrix(ZZ, n, m - n)]],
+                         subdivide=False)
+        return _original_order(H, pivots + rest)
+
+    # General case: w^T A + y^T (q I_n) = 0 over the integers, projected to w.
+    G = Matrix(ZZ, A_list).stack(q * identity_matrix(ZZ, n))
+    K = G.left_kernel().basis_matrix().matrix_from_columns(range(m))
+    H = K.echelon_form()
+    return H.matrix_from_rows([i for i in range(H.nrows()) if not H[i].is_zero()])
+
+
+def kannan_embedding(basis, b_list, t):
+    # (m+1) x (m+1) basis with the target row (b, t) first, as in the
+    # original embedding.
+    m = basis.ncols()
+    M = Matrix(ZZ, basis.nrows() + 1, m + 1)
+    M.set_block(1, 0, basis)
+    M.set_row(0, list(b_list) + [t])
+    return M
+
+
+def qary_embedding(A_list, b_list, q):
+    return kannan_embedding(qary_basis(A_list, q), b_list, q)
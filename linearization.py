@@ -0,0 +1,117 @@
+from itertools import combinations_with_replacement
+from math import comb, factorial
+
+import numpy as np
+
+# Linearization of Arora-Ge systems. Every equation has degree d = |E|; each
+# monomial of degree <= d becomes an unknown, so with enough samples the
+# system is an ordinary linear system over GF(q) whose solution contains the
+# secret as the values of the degree-1 monomials.
+#
+# The equations are built in bulk: with P(t) = prod_{e in E} (t - e) =
+# sum_k c_k t^k, sample i gives P(b_i - L_i) with L_i = <a_i, x>, i.e.
+#
+#     sum_j D[i, j] L_i^j,  D[i, j] = (-1)^j sum_{k>=j} c_k C(k, j) b_i^(k-j),
+#
+# and the coefficient of x^alpha (|alpha| = j) in L_i^j is the multinomial
+# coefficient times prod_l a_il^alpha_l. Each column is computed for all m
+# samples at once from the column of its prefix monomial.
+
+
+def _combos(n, degree):
+    for k in range(degree + 1):
+        yield from combinations_with_replacement(range(n), k)
+
+
+def _exponents(combo, n):
+    exponents = [0] * n
+    for j in combo:
+        exponents[j] += 1
+    return tuple(exponents)
+
+
+def monomials(n, degree):
+    # Exponent tuples of total degree <= degree: the constant first, then
+    # x_0 .. x_{n-1}, then the higher degrees.
+    return [_exponents(combo, n) for combo in _combos(n, degree)]
+
+
+def monomial_index(n, degree):
+    return {mono: i for i, mono in enumerate(monomials(n, degree))}
+
+
+def error_polynomial(E):
+    # Coefficients c_0 .. c_d of P(t) = prod_{e in E} (t - e).
+    c = [1]
+    for e in E:
+        c = [(c[k - 1] if k > 0 else 0) - e * (c[k] if k < len(c) else 0) for k in range(len(c) + 1)]
+    return c
+
+
+def _multinomial(combo):
+    coef = factorial(len(combo))
+    for j in set(combo):
+        coef //= factorial(combo.count(j))
+    return coef
+
+
+def build_system(q, A, b, E):
+    """
+    Coefficient matrix of the Arora-Ge equations P(b_i - <a_i, x>) = 0 for
+    all samples: an m x C(n+d, d) int64 array with entries in [0, q),
+    columns in monomials(n, d) order.
+    """
+    if q >= 2 ** 31:
+        raise ValueError("q must be below 2^31 for int64 arithmetic")
+    A = np.asarray(A, dtype=np.int64) % q
+    b = np.asarray(b, dtype=np.int64) % q
+    m, n = A.shape
+    d = len(E)
+    c = [x % q for x in error_polynomial(E)]
+
+    b_pow = [np.ones(m, dtype=np.int64)]
+    for _ in range(d):
+        b_pow.append(b_pow[-1] * b % q)
+    D = np.zeros((m, d + 1), dtype=np.int64)
+    for j in range(d + 1):
+        for k in range(j, d + 1):
+            D[:, j] = (D[:, j] + c[k] * comb(k, j) % q * b_pow[k - j]) % q
+        if j % 2:
+            D[:, j] = -D[:, j] % q
+
+    M = np.empty((m, comb(n + d, d)), dtype=np.int64)
+    prefix = {(): np.ones(m, dtype=np.int64)}
+    for col, combo in enumerate(_combos(n, d)):
+        if combo:
+            column = prefix[combo[:-1]] * A[:, combo[-1]] % q
+            if len(combo) < d:
+                prefix[combo] = column
+        else:
+            column = prefix[()]
+        M[:, col] = column * (_multinomial(combo) % q) % q * D[:, len(combo)] % q
+    return M
+
+
+def system_polynomials(ring, M, n, degree):
+    # The rows of a build_system() matrix as polynomials of ring.
+    monos = monomials(n, degree)
+    return [ring({mono: int(c) for mono, c in zip(monos, row) if c}) for row in M]
+
+
+def solve_linearized(M, n):
+    """
+    Solve M * (1, x_0, ..., x_{n-1}, higher monomials)^T = 0 for the
+    degree-1 monomials (M a Sage matrix over GF(q)). Returns
+    [x_0, ..., x_{n-1}] or None if the system is inconsistent or does not
+    determine them.
+    """
+    A = M.matrix_from_columns(range(1, M.ncols()))
+    try:
+        y = A.solve_right(-M.column(0))
+    except ValueError:
+        return None
+    # Extra solutions are harmless as long as none of them moves x.
+    K = A.right_kernel_matrix()
+    if any(K[i, j] != 0 for i in range(K.nrows()) for j in range(n)):
+        return None
+    return [int(y[j]) for j in range(n)]
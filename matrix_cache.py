@@ -0,0 +1,87 @@
+from collections import OrderedDict
+import numpy as np
+
+# Bounded LRU cache for expanded public matrices (generate_A). Entries are
+# frozen before they are stored so a caller cannot corrupt a shared instance.
+
+
+def freeze(M):
+    if isinstance(M, np.ndarray):
+        M.flags.writeable = False
+    else:
+        M.set_immutable()
+    return M
+
+
+def matrix_nbytes(M):
+    if isinstance(M, np.ndarray):
+        return M.nbytes
+    # Sage ZZ entries are mpz_t; count 32 bytes per entry as a rough budget.
+    return 32 * M.nrows() * M.ncols()
+
+
+class MatrixCache:
+    def __init__(self, max_entries=32, max_bytes=64 << 20):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._bytes = 0
+
+    def configure(self, max_entries=None, max_bytes=None):
+        if max_entries is not None:
+            self.max_entries = max_entries
+        if max_bytes is not None:
+            self.max_bytes = max_bytes
+        self._evict()
+
+    def get(self, key):
+        try:
+            M, _ = self._entries[key]
+        except KeyError:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return M
+
+    def put(self, key, M):
+        M = freeze(M)
+        size = matrix_nbytes(M)
+        if key in self._entries:
+            self._bytes -= self._entries.pop(key)[1]
+        if self.max_entries > 0 and size <= self.max_bytes:
+            self._entries[key] = (M, size)
+            self._bytes += size
+            self._evict()
+        return M
+
+    def get_or_compute(self, key, compute):
+        M = self.get(key)
+        if M is None:
+            M = self.put(key, compute())
+        return M
+
+    def clear(self):
+        self._entries.clear()
+        self._bytes = 0
+        self.hits = self.misses = 0
+
+    def stats(self):
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+        }
+
+    def _evict(self):
+        while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            _, (_, size) = self._entries.popitem(last=False)
+            self._bytes -= size
+
+    def __len__(self):
+        return len(self._entries)
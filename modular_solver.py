@@ -0,0 +1,140 @@
+import numpy as np
+
+# Solve A x = b (mod q) for many right-hand sides at once, q = p^k a prime
+# power (q = 2^15 for FrodoKEM, the prime 65537 for the primal attack).
+#
+# A is factored once modulo p: Gaussian elimination on A^T picks n rows P
+# of A that are independent mod p, and A_P^-1 mod p is lifted to mod p^k by
+# the Newton/Hensel iteration X <- X (2I - A_P X), which doubles the p-adic
+# precision each step (k = 1, a prime field, needs no lifting). Every
+# column is then X b_P, checked against all rows of A.
+
+
+class NotInvertible(ValueError):
+    pass
+
+
+def prime_power(q):
+    p = next((d for d in range(2, int(q ** 0.5) + 1) if q % d == 0), q)
+    k, r = 0, q
+    while r % p == 0:
+        r //= p
+        k += 1
+    if r != 1:
+        raise ValueError(f"{q} is not a prime power")
+    return p, k
+
+
+def _matmul_mod(X, Y, q):
+    if X.shape[1] * (q - 1) ** 2 < 2 ** 63:
+        return X @ Y % q
+    return (X.astype(object) @ Y.astype(object) % q).astype(np.int64)
+
+
+def _rref_mod_p(M, p):
+    M = M % p
+    rows, cols = M.shape
+    pivots = []
+    r = 0
+    for c in range(cols):
+        if r == rows:
+            break
+        nz = np.nonzero(M[r:, c])[0]
+        if nz.size == 0:
+            continue
+        i = r + nz[0]
+        if i != r:
+            M[[r, i]] = M[[i, r]]
+        M[r] = M[r] * pow(int(M[r, c]), -1, p) % p
+        f = M[:, c].copy()
+        f[r] = 0
+        M = (M - np.outer(f, M[r])) % p
+        pivots.append(c)
+        r += 1
+    return M, pivots
+
+
+def factor(A, q):
+    """
+    Factor the r x n matrix A (r >= n) modulo q = p^k. Returns (rows,
+    inverse): n row indices P with A_P invertible mod p, and A_P^-1 mod q.
+    Raises NotInvertible if A does not have full column rank mod p.
+    """
+    p, k = prime_power(q)
+    A = np.asarray(A, dtype=np.int64) % q
+    n = A.shape[1]
+    _, rows = _rref_mod_p(A.T.copy(), p)
+    if len(rows) < n:
+        raise NotInvertible(f"A has rank {len(rows)} < {n} modulo {p}")
+    A_P = A[rows]
+    R, _ = _rref_mod_p(np.hstack([A_P, np.eye(n, dtype=np.int64)]), p)
+    X = R[:, n:]
+    precision = 1
+    while precision < k:
+        X = _matmul_mod(X, (2 * np.eye(n, dtype=np.int64) - _matmul_mod(A_P, X, q)) % q, q)
+        precision *= 2
+    return rows, X
+
+
+def solve_mod(A, B, q):
+    """
+    Solve A X = B (mod q) for all columns of B (or a single vector B).
+    Returns (X, ok): X is n x k (or length n) with entries in [0, q), and
+    ok[j] tells whether column j is actually a solution, i.e. whether
+    that right-hand side was consistent.
+    """
+    A = np.asarray(A, dtype=np.int64) % q
+    B = np.asarray(B, dtype=np.int64) % q
+    single = B.ndim == 1
+    if single:
+        B = B[:, None]
+    rows, inverse = factor(A, q)
+    X = _matmul_mod(inverse, B[rows], q)
+    ok = ~np.any(_matmul_mod(A, X, q) != B, axis=0)
+    if single:
+        return X[:, 0], bool(ok[0])
+    return X, ok
+
+
+def _solve_generic(A, B, q):
+    # Sage's generic Z/qZ solver, one column at a time, for matrices that
+    # are singular modulo p.
+    from sage.matrix.constructor import matrix as Matrix
+    from sage.modules.free_module_element import vector
+    from sage.rings.finite_rings.integer_mod_ring import IntegerModRing
+    R = IntegerModRing(q)
+    M = Matrix(R, A)
+    B = np.asarray(B, dtype=np.int64)
+    X = np.zeros((M.ncols(), B.shape[1]), dtype=np.int64)
+    ok = np.zeros(B.shape[1], dtype=bool)
+    for j in range(B.shape[1]):
+        try:
+            X[:, j] = [int(x) for x in M.solve_right(vector(R, B[:, j].tolist()))]
+            ok[j] = True
+        except ValueError:
+            pass
+    return X, ok
+
+
+def solve_lwe(A_list, b_cols, q, error_vectors):
+    """
+    Secrets s_j with A s_j = b_j - e_j (mod q) for each right-hand side
+    b_j and its recovered error vector e_j (None entries: samples not used).
+    Columns with the same known samples share one factorisation; a column
+    whose system is inconsistent gets None.
+    """
+    groups = {}
+    for col, err in enumerate(error_vectors):
+        groups.setdefault(tuple(i for i, e in enumerate(err) if e is not None), []).append(col)
+    secrets = [None] * len(b_cols)
+    for keep, cols in groups.items():
+        A = [[int(x) % q for x in A_list[i]] for i in keep]
+        B = [[(int(b_cols[c][i]) - error_vectors[c][i]) % q for c in cols] for i in keep]
+        try:
+            X, ok = solve_mod(A, B, q)
+        except NotInvertible:
+            X, ok = _solve_generic(A, B, q)
+        for j, c in enumerate(cols):
+            if ok[j]:
+                secrets[c] = [int(x) for x in X[:, j]]
+    return secrets
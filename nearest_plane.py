@@ -0,0 +1,105 @@
+import math
+
+import numpy as np
+
+# Babai nearest-plane decoding against one reduced basis for many targets.
+#
+# The Gram-Schmidt data is computed once: B^T = Q R (Householder QR in
+# float64), so row b_i of B is column i of R in the orthonormal coordinates
+# Q, ||b*_i|| = |R[i, i]| and mu[i, j] = R[j, i] / R[j, j]. A batch of targets
+# T (one per row) is mapped to Y = T Q and decoded column by column from the
+# last basis vector down, each step being a rank-1 update of all targets.
+#
+# float64 is used when the basis is well enough conditioned; otherwise the
+# exact rational GSO from Sage is used, still once per basis and batched.
+
+DOUBLE_BITS = 53
+# Slack for the rounding error accumulated over the k decoding steps.
+PRECISION_MARGIN = 10
+
+
+def _rows(basis):
+    if isinstance(basis, np.ndarray):
+        return basis.astype(np.int64)
+    return np.array([[int(x) for x in row] for row in basis], dtype=np.int64)
+
+
+def _exact_mul(C, B):
+    # C @ B without int64 overflow.
+    bound = int(np.abs(C).max(initial=0)) * int(np.abs(B).max(initial=0)) * B.shape[0]
+    if bound < 2 ** 62:
+        return C @ B
+    return C.astype(object) @ B.astype(object)
+
+
+class NearestPlane:
+    def __init__(self, basis, precision="auto"):
+        self.basis = _rows(basis)
+        if precision not in ("auto", "double", "exact"):
+            raise ValueError(f"Unknown precision {precision!r}")
+        Q, R = np.linalg.qr(self.basis.T.astype(np.float64))
+        if precision == "auto":
+            precision = "double" if self._required_bits(R) <= DOUBLE_BITS else "exact"
+        self.precision = precision
+        if precision == "double":
+            self.Q = Q
+            self.R = R
+            self.gs_norms = np.diag(R) ** 2
+            self.mu = (R / np.diag(R)[:, None]).T
+        else:
+            self._setup_exact()
+
+    def _required_bits(self, R):
+        # Bits needed to round target coordinates correctly: size of the
+        # longest vector relative to the shortest Gram-Schmidt norm, plus
+        # the dimension.
+        diag = np.abs(np.diag(R))
+        if diag.size == 0 or diag.min() == 0:
+            return math.inf
+        longest = np.linalg.norm(self.basis.astype(np.float64), axis=1).max()
+        return math.log2(longest / diag.min()) + math.log2(diag.size) + PRECISION_MARGIN
+
+    def _setup_exact(self):
+        from sage.matrix.constructor import matrix as Matrix
+        from sage.rings.rational_field import QQ
+        self._B = Matrix(QQ, self.basis.tolist())
+        G, self.mu = self._B.gram_schmidt()
+        self._G = G
+        self.gs_norms = [G.row(i) * G.row(i) for i in range(G.nrows())]
+
+    def coefficients(self, targets):
+        """
+        Integer coefficients c (one row per target) of the nearest-plane
+        lattice vector c * basis for each row of targets.
+        """
+        T = _rows(targets)
+        if T.ndim == 1:
+            T = T[None, :]
+        k = self.basis.shape[0]
+        if self.precision == "double":
+            Y = T.astype(np.float64) @ self.Q
+            C = np.zeros((T.shape[0], k), dtype=np.int64)
+            for i in reversed(range(k)):
+                c = np.rint(Y[:, i] / self.R[i, i])
+                C[:, i] = c
+                Y[:, :i + 1] -= np.outer(c, self.R[:i + 1, i])
+            return C
+
+        from sage.matrix.constructor import matrix as Matrix
+        from sage.rings.rational_field import QQ
+        Y = Matrix(QQ, T.tolist())
+        C = np.zeros((T.shape[0], k), dtype=object)
+        for i in reversed(range(k)):
+            c = [(x / self.gs_norms[i]).round() for x in Y * self._G.row(i)]
+            C[:, i] = [int(x) for x in c]
+            Y -= Matrix(QQ, len(c), 1, c) * self._B.matrix_from_rows([i])
+        return C
+
+    def closest(self, targets):
+        return _exact_mul(self.coefficients(targets), self.basis)
+
+    def errors(self, targets):
+        T = _rows(targets)
+        if T.ndim == 1:
+            T = T[None, :]
+        return T - self.closest(T)
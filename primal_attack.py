@@ -1,70 +1,83 @@
 import time
+import argparse
+import os
+from multiprocessing import Pool
+from functools import partial
 from sage.all import *
+import numpy as np
+from timing import phase
+from lattice_construction import qary_embedding
+from sample_planner import resolve_samples, random_rows, parse_samples
+from estimator import estimate_primal, enforce, add_policy_arguments, load_calibration
+from modular_solver import solve_lwe
+from reduction import find_error_vector, set_checkpoint_dir, DEFAULT_BLOCKSIZES
+from sweep import sweep_benchmark, add_sweep_arguments, sweep_options
 
-def generate_key(n=32, q=4093, p=257, samples=64):
-    delta = q // p
-    R = Integers(q)
-    s = vector(ZZ, [randrange(-5, 6) for _ in range(n)])
-    A_list = []
-    b_list = []
-    for _ in range(samples):
-        a = vector(ZZ, [randint(0, q - 1) for _ in range(n)])
-        e = randint(-3, 3)  
-        b = int((a * s + e) % q)
-        A_list.append(a)
-        b_list.append(b)
-    
-    return s, A_list, b_list, q
+def generate_instances(count, n=32, q=4093, samples=64, seed=None):
+    """
+    A batch of LWE instances as int64 arrays: secrets S (count x n) in
+    [-5, 5], samples A (count x samples x n) and B (count x samples) with
+    errors in [-3, 3].
+    """
+    rng = np.random.default_rng(seed)
+    S = rng.integers(-5, 6, size=(count, n))
+    A = rng.integers(0, q, size=(count, samples, n))
+    E = rng.integers(-3, 4, size=(count, samples))
+    B = (np.einsum("kij,kj->ki", A, S) + E) % q
+    return S, A, B
 
-def recover_error(A_list, b_list, q):
-    n = len(A_list[0])
-    m = len(A_list)
-    M = Matrix(ZZ, n + 1 + m, m + 1)
+def generate_key(n=32, q=4093, p=257, samples=64, seed=None):
+    S, A, B = generate_instances(1, n, q, samples, seed)
+    return S[0].tolist(), A[0].tolist(), B[0].tolist(), q
 
-    for i in range(m):
-        M[0, i] = b_list[i]
-    M[0, m] = q
+def recover_error(A_list, b_list, q, bound=3, blocksizes=DEFAULT_BLOCKSIZES, rows=None):
+    # rows selects the samples to embed (default: all); the others get None
+    # in the returned error vector and are ignored by recover_secret.
+    if rows is None:
+        rows = range(len(A_list))
+    with phase("construction"):
+        M = qary_embedding([A_list[i] for i in rows], [b_list[i] for i in rows], q)
+    err = find_error_vector(M, q, bound, blocksizes)
+    error_vector = [None] * len(A_list)
+    for i, e in zip(rows, err):
+        error_vector[i] = e
+    return error_vector
 
-    for i in range(n):
-        for j in range(m):
-            M[i + 1, j] = A_list[j][i] % q
-
-    for i in range(m):
-        M[n + 1 + i, i] = q
-
-    L = M.LLL()
-    err = L[-1]
-    if err[-1] < 0:
-        err = [-e for e in err]
-
-    if err[-1] != q or not all(abs(e) <= 3 for e in err[:-1]):
-        raise ValueError("Error vector recovery failed")
-
-    return err[:-1]
+def recover_error_subsets(A_list, b_list, q, samples, bound=3, attempts=3, blocksizes=DEFAULT_BLOCKSIZES):
+    # Embed only `samples` random samples ("auto": ask the planner), drawing
+    # a fresh subset after a failed attempt.
+    n, m = len(A_list[0]), len(A_list)
+    samples = resolve_samples(samples, n, q, m, bound)
+    for attempt in range(attempts):
+        rows = random_rows(m, samples) if samples else None
+        try:
+            return recover_error(A_list, b_list, q, bound, blocksizes, rows)
+        except ValueError:
+            if rows is None or attempt == attempts - 1:
+                raise
 
 def recover_secret(A_list, b_list, q, error_vector):
-    R = IntegerModRing(q)
-    A = Matrix(R, [list(map(lambda x: x % q, row)) for row in A_list])
-    b_vec = vector(R, [(b - e) % q for b, e in zip(b_list, error_vector)])
-    try:
-        s = A.solve_right(b_vec)
-        return s
-    except ValueError:
-        ker = A.kernel()
-        if ker.dimension() == 0:
-            raise ValueError("No solution found")
-        particular = A.solve_right(b_vec)
-        return particular
+    with phase("solve"):
+        s = solve_lwe(A_list, [b_list], q, [error_vector])[0]
+    if s is None:
+        raise ValueError("No solution found")
+    return s
 
-def benchmark_primal_attack(parameter_sets):
+def benchmark_primal_attack(parameter_sets, samples=None, attempts=3, policy=None, max_seconds=None, calibration=None):
     results = []
     for (n, q, m) in parameter_sets:
         print(f"[*] Testing n={n}, q={q}, m={m}")
         try:
+            run_samples = samples
+            if enforce(estimate_primal(n, q, m, bound=3, calibration=calibration), policy, max_seconds) == "downgrade":
+                run_samples = "auto"
             t0 = time.time()
             s_real, A_list, b_list, q = generate_key(n=n, q=q, samples=m)
             t1 = time.time()
-            error_vector = recover_error(A_list, b_list, q)
+            if run_samples is None:
+                error_vector = recover_error(A_list, b_list, q)
+            else:
+                error_vector = recover_error_subsets(A_list, b_list, q, run_samples, attempts=attempts)
             t2 = time.time()
             s_recovered = recover_secret(A_list, b_list, q, error_vector)
             t3 = time.time()
@@ -92,16 +105,96 @@ def benchmark_primal_attack(parameter_sets):
             })
     return results
 
+def attack_instance(A, b, s, q, samples=None, attempts=3):
+    # One generate_instances() instance: (success, seconds, error message).
+    A_list, b_list = A.tolist(), b.tolist()
+    start = time.perf_counter()
+    try:
+        if samples is None:
+            error_vector = recover_error(A_list, b_list, q)
+        else:
+            error_vector = recover_error_subsets(A_list, b_list, q, samples, attempts=attempts)
+        s_recovered = recover_secret(A_list, b_list, q, error_vector)
+    except Exception as e:
+        # One failed instance (including Sage arithmetic errors) must not
+        # abort the whole run.
+        return False, time.perf_counter() - start, str(e) or repr(e)
+    success = all((x - y) % q == 0 for x, y in zip(s.tolist(), s_recovered))
+    return success, time.perf_counter() - start, None
+
+def _attack_instance(args):
+    return attack_instance(*args)
+
+def throughput_benchmark(n, q, m, instances, workers=None, samples=None, attempts=3, seed=None,
+                         policy=None, max_seconds=None, calibration=None):
+    """
+    Attack `instances` fresh instances of one parameter set on a pool of
+    `workers` processes (default: all cores). Returns successes, wall
+    time, instances per second and keys per hour, and latency percentiles
+    of the individual attacks. policy/max_seconds are checked once for the
+    parameter set, as in benchmark_primal_attack.
+    """
+    if enforce(estimate_primal(n, q, m, bound=3, calibration=calibration), policy, max_seconds) == "downgrade":
+        samples = "auto"
+    S, A, B = generate_instances(instances, n, q, m, seed)
+    jobs = ((A[k], B[k], S[k], q, samples, attempts) for k in range(instances))
+    start = time.perf_counter()
+    with Pool(workers or os.cpu_count()) as pool:
+        results = list(pool.imap_unordered(_attack_instance, jobs))
+    elapsed = time.perf_counter() - start
+    latencies = np.array([t for _, t, _ in results])
+    successes = int(np.count_nonzero([ok for ok, _, _ in results]))
+    return {
+        "n": n,
+        "q": q,
+        "m": m,
+        "instances": instances,
+        "successes": successes,
+        "errors": sorted({err for _, _, err in results if err}),
+        "elapsed": elapsed,
+        "throughput": instances / elapsed,
+        "keys_per_hour": 3600 * successes / elapsed,
+        "latency": dict(zip(("p50", "p90", "p99", "max"), np.percentile(latencies, [50, 90, 99, 100]).tolist())),
+    }
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    add_sweep_arguments(parser)
+    parser.add_argument("--samples", type=parse_samples, help="samples to embed: a count or 'auto' (default: all)")
+    add_policy_arguments(parser)
+    parser.add_argument("--reduction-checkpoints", metavar="DIR", help="save and resume partial reductions in DIR")
+    parser.add_argument("--throughput", type=int, metavar="N", help="attack N instances per parameter set on --jobs workers and report instances/s")
+    args = parser.parse_args()
+    if args.throughput and (args.timeout or args.mem_limit or args.checkpoint):
+        parser.error("--timeout, --mem-limit and --checkpoint apply to the sweep, not to --throughput")
+    if args.reduction_checkpoints:
+        set_checkpoint_dir(args.reduction_checkpoints)
+    calibration = load_calibration(args.calibration)
     parameter_sets = [
     (60, 65537, 270),
     (60, 65537, 300),
     (60, 65537, 360)
     ]
-    results = benchmark_primal_attack(parameter_sets)
-    print("\nSummary:")
-    for r in results:
-        if r["success"]:
-            print(f"n={r['n']}, q={r['q']}, m={r['m']} → ✓ Success | Time: {r['total_time']:.2f}s")
-        else:
-            print(f"n={r['n']}, q={r['q']}, m={r['m']} → ✗ Failure | Error: {r.get('error', 'Unknown')}")
+    if args.throughput:
+        for (n, q, m) in parameter_sets:
+            try:
+                r = throughput_benchmark(n, q, m, args.throughput, args.jobs, args.samples,
+                                         policy=args.policy, max_seconds=args.max_seconds, calibration=calibration)
+            except ValueError as e:
+                print(f"n={n}, q={q}, m={m} → ✗ Refused | {e}")
+                continue
+            lat = r["latency"]
+            print(f"n={n}, q={q}, m={m} → {r['successes']}/{r['instances']} broken in {r['elapsed']:.2f}s | "
+                  f"{r['throughput']:.3f} instances/s, {r['keys_per_hour']:.0f} keys/h | "
+                  f"latency p50 {lat['p50']:.2f}s, p90 {lat['p90']:.2f}s, p99 {lat['p99']:.2f}s, max {lat['max']:.2f}s")
+            for err in r["errors"]:
+                print(f"  error: {err}")
+    else:
+        results = sweep_benchmark(partial(benchmark_primal_attack, samples=args.samples,
+                                                policy=args.policy, max_seconds=args.max_seconds, calibration=calibration), parameter_sets, **sweep_options(args))
+        print("\nSummary:")
+        for r in results:
+            if r["success"]:
+                print(f"n={r['n']}, q={r['q']}, m={r['m']} → ✓ Success | Time: {r['total_time']:.2f}s")
+            else:
+                print(f"n={r['n']}, q={r['q']}, m={r['m']} → ✗ Failure | Error: {r.get('error', 'Unknown')}")
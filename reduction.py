@@ -0,0 +1,153 @@
+import json
+import os
+import time
+
+from timing import phase
+from basis_cache import basis_key
+
+# Reduction strategy for the primal embedding: LLL first, then BKZ with an
+# increasing block size, one tour at a time, stopping as soon as some basis
+# row is a valid embedded error vector.
+#
+# With a checkpoint directory (set_checkpoint_dir, $REDUCTION_CHECKPOINT_DIR
+# or the checkpoint_dir argument) the partially reduced basis and the stage
+# reached are written to <dir>/<hash of input basis and stages>.json at most
+# every CHECKPOINT_INTERVAL seconds, and a later call on the same instance
+# resumes from there. Sage's LLL cannot be interrupted, so when
+# checkpointing it is split into passes of increasing delta.
+
+DEFAULT_BLOCKSIZES = (10, 20, 30, 40, 50, 60)
+CHECKPOINT_DELTAS = (0.5, 0.75, 0.99)
+CHECKPOINT_INTERVAL = 60
+
+_checkpoint_dir = os.environ.get("REDUCTION_CHECKPOINT_DIR") or None
+
+
+def set_checkpoint_dir(path):
+    global _checkpoint_dir
+    _checkpoint_dir = path or None
+
+
+def embedded_error(L, q, bound):
+    # A row (e, ±q) with every |e_i| <= bound, normalised to last entry q.
+    for row in L:
+        if row[-1] == -q:
+            row = -row
+        elif row[-1] != q:
+            continue
+        err = [int(e) for e in row[:-1]]
+        if all(abs(e) <= bound for e in err):
+            return err
+    return None
+
+
+def nonzero_rows(L):
+    return L.matrix_from_rows([i for i in range(L.nrows()) if not L[i].is_zero()])
+
+
+class ReductionCheckpoint:
+    def __init__(self, M, stages, directory, interval=CHECKPOINT_INTERVAL):
+        self.path = os.path.join(directory, basis_key(M, "progressive", stages=stages) + ".json")
+        self.interval = interval
+        self._last = time.monotonic()
+
+    def load(self):
+        try:
+            with open(self.path) as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return None
+        from sage.matrix.constructor import matrix as Matrix
+        from sage.rings.integer_ring import ZZ
+        return Matrix(ZZ, state["basis"]), state["stage"]
+
+    def save(self, L, stage, force=False):
+        now = time.monotonic()
+        if not force and now - self._last < self.interval:
+            return
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump({"stage": stage, "basis": [[int(x) for x in row] for row in L]}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+        self._last = now
+
+    def remove(self):
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+
+def _stages(blocksizes, checkpointing):
+    deltas = CHECKPOINT_DELTAS if checkpointing else (None,)
+    return [["LLL", delta] for delta in deltas] + [["BKZ", beta] for beta in blocksizes]
+
+
+def _run_stages(M, stages, accept, checkpoint_dir=None):
+    # Returns (accepted result or None, basis, name of the last stage run).
+    directory = checkpoint_dir or _checkpoint_dir
+    checkpoint = ReductionCheckpoint(M, stages, directory) if directory else None
+    L, idx = M, 0
+    state = checkpoint.load() if checkpoint else None
+    if state is not None:
+        L, idx = state
+    strategy = "LLL"
+    found = None
+    while idx < len(stages):
+        kind, param = stages[idx]
+        if kind == "LLL":
+            with phase("reduction"):
+                L = nonzero_rows(L.LLL() if param is None else L.LLL(delta=param))
+            converged = True
+        else:
+            beta = min(param, L.nrows())
+            strategy = f"BKZ-{beta}"
+            with phase("reduction"):
+                L_next = L.BKZ(block_size=beta, max_loops=1)
+            converged = L_next == L
+            L = L_next
+        found = accept(L)
+        if found is not None:
+            break
+        if converged:
+            idx = len(stages) if kind == "BKZ" and beta == L.nrows() else idx + 1
+        if checkpoint:
+            checkpoint.save(L, idx)
+    if checkpoint:
+        checkpoint.remove()
+    return found, L, strategy
+
+
+def progressive_reduce(M, accept, blocksizes=DEFAULT_BLOCKSIZES, checkpoint_dir=None):
+    """
+    Reduce M until accept(basis) returns something other than None.
+    Returns (result, reduced basis); raises ValueError if the last block
+    size converges without an accepted row.
+    """
+    stages = _stages(blocksizes, bool(checkpoint_dir or _checkpoint_dir))
+    found, L, strategy = _run_stages(M, stages, accept, checkpoint_dir)
+    if found is None:
+        raise ValueError(f"No valid error vector after {strategy}")
+    return found, L
+
+
+def lll_reduce(M, checkpoint_dir=None):
+    # LLL-reduced basis of M without zero rows, resumable like
+    # progressive_reduce.
+    stages = _stages((), bool(checkpoint_dir or _checkpoint_dir))
+    return _run_stages(M, stages, lambda L: None, checkpoint_dir)[1]
+
+
+def bkz_reduce(M, blocksize, checkpoint_dir=None):
+    # lll_reduce followed by BKZ-blocksize run to convergence.
+    L = lll_reduce(M, checkpoint_dir)
+    with phase("reduction"):
+        return L.BKZ(block_size=min(blocksize, L.nrows()))
+
+
+def find_error_vector(M, q, bound, blocksizes=DEFAULT_BLOCKSIZES, checkpoint_dir=None):
+    err, _ = progressive_reduce(M, lambda L: embedded_error(L, q, bound), blocksizes, checkpoint_dir)
+    return err
@@ -0,0 +1,98 @@
+import math
+import random
+
+# Choose how many LWE samples to put into the primal embedding.
+#
+# With the embedding factor t = q used in this repo, the (b, q) row is never
+# swapped forward by LLL/BKZ; it is size-reduced against the reduced q-ary
+# basis, i.e. the attack is Babai nearest-plane decoding of b. Under the
+# geometric series assumption (GSA) the Gram-Schmidt norms of a reduced
+# basis of L_q(A') (A' = m' sampled rows, rank m', volume q^(m'-n)) are
+#
+#     log ||b*_i|| = log(vol)/m' + (m' - 1 - 2i) log(delta),
+#
+# clipped to [1, q] (Z-shape of q-ary lattices), and nearest plane recovers
+# an error with per-coordinate deviation sigma with probability
+# prod_i erf(||b*_i|| / (2*sqrt(2)*sigma)) (Lindner-Peikert). More samples
+# raise the volume but also the dimension; the planner picks the smallest m'
+# that reaches the target probability at the weakest reduction.
+
+LLL_DELTA = 1.0219
+PLAN_BLOCKSIZES = (None, 10, 20, 30, 40, 50, 60)  # None = LLL only
+
+
+def root_hermite_factor(beta):
+    if beta is None or beta <= 2:
+        return LLL_DELTA
+    if beta >= 50:
+        return ((math.pi * beta) ** (1.0 / beta) * beta / (2 * math.pi * math.e)) ** (1.0 / (2 * (beta - 1)))
+    # The asymptotic formula is meaningless for small blocks; interpolate
+    # between LLL and BKZ-50.
+    hi = root_hermite_factor(50)
+    return LLL_DELTA + (hi - LLL_DELTA) * (beta - 2) / 48
+
+
+def uniform_sigma(bound):
+    # Standard deviation of the uniform distribution on [-bound, bound].
+    return math.sqrt(bound * (bound + 1) / 3)
+
+
+def gsa_log_profile(dim, log_volume, delta, log_q):
+    base = log_volume / dim
+    slope = math.log(delta)
+    return [min(max(base + (dim - 1 - 2 * i) * slope, 0.0), log_q) for i in range(dim)]
+
+
+def nearest_plane_success(log_profile, sigma):
+    p = 1.0
+    for log_b in log_profile:
+        p *= math.erf(math.exp(log_b) / (2 * math.sqrt(2) * sigma))
+    return p
+
+
+def success_probability(n, q, samples, sigma, beta=None):
+    log_q = math.log(q)
+    profile = gsa_log_profile(samples, (samples - n) * log_q, root_hermite_factor(beta), log_q)
+    return nearest_plane_success(profile, sigma)
+
+
+def plan_samples(n, q, available, bound=None, sigma=None, target=0.99, blocksizes=PLAN_BLOCKSIZES):
+    """
+    Pick the number of samples m' (n < m' <= available) to embed.
+    Returns a dict with samples, blocksize (None = LLL), dimension,
+    success_probability and feasible (whether target was reached).
+    """
+    if sigma is None:
+        sigma = uniform_sigma(bound)
+    best = None
+    for beta in blocksizes:
+        for samples in range(n + 1, available + 1):
+            p = success_probability(n, q, samples, sigma, beta)
+            if p >= target:
+                return {"samples": samples, "blocksize": beta, "dimension": samples + 1,
+                        "success_probability": p, "feasible": True}
+            if best is None or p > best["success_probability"]:
+                best = {"samples": samples, "blocksize": beta, "dimension": samples + 1,
+                        "success_probability": p, "feasible": False}
+    return best
+
+
+def random_rows(m, samples, rng=random):
+    return sorted(rng.sample(range(m), samples))
+
+
+def resolve_samples(samples, n, q, available, bound, sigma=None):
+    # None -> embed every sample, "auto" -> plan_samples(), int -> as given.
+    if samples == "auto":
+        samples = plan_samples(n, q, available, bound=bound, sigma=sigma)["samples"]
+    if samples is None or samples >= available:
+        return None
+    if samples <= n:
+        # The secret is not determined by n or fewer samples.
+        raise ValueError(f"Need more than n={n} samples, got {samples}")
+    return int(samples)
+
+
+def parse_samples(value):
+    # argparse type for --samples: "auto" or a sample count.
+    return value if value == "auto" else int(value)
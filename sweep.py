@@ -0,0 +1,185 @@
+import json
+import os
+import resource
+import time
+import multiprocessing
+from multiprocessing.connection import wait
+
+# Parameter-sweep scheduler. Every point runs in its own forked process so a
+# runaway job (e.g. a Groebner basis blow-up) can be killed at its wall-clock
+# limit or stopped by its address-space limit without taking the sweep down.
+# Finished points are appended to a JSON-lines checkpoint, tagged with the
+# benchmark that produced them, and skipped when the same benchmark is
+# restarted with the same file.
+
+
+def point_key(point, benchmark=None):
+    point = list(point) if isinstance(point, tuple) else point
+    if benchmark is None:
+        return json.dumps(point, sort_keys=True)
+    return json.dumps({"benchmark": benchmark, "point": point}, sort_keys=True)
+
+
+def benchmark_name(func):
+    # functools.partial(benchmark_x, ...) -> "benchmark_x"
+    func = getattr(func, "func", func)
+    return f"{func.__module__}.{func.__qualname__}"
+
+
+def load_checkpoint(path, benchmark=None):
+    # Records of `benchmark` only; others in the same file are left alone.
+    done = {}
+    if path and os.path.exists(path):
+        with open(path) as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue  # torn last line from an interrupted write
+                if record.get("benchmark") != benchmark:
+                    continue
+                done[record["key"]] = record
+    return done
+
+
+def _append_checkpoint(path, record):
+    with open(path, "a") as f:
+        f.write(json.dumps(record, default=str) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def _run_job(conn, func, point, mem_limit):
+    if mem_limit:
+        resource.setrlimit(resource.RLIMIT_AS, (mem_limit, mem_limit))
+    try:
+        conn.send(("ok", func(point)))
+    except MemoryError:
+        conn.send(("memory", "memory limit exceeded"))
+    except BaseException as e:
+        conn.send(("error", repr(e)))
+    finally:
+        conn.close()
+
+
+def _crash_status(proc, mem_limit):
+    # Under an address-space limit, GMP/Singular allocation failures abort
+    # the process (SIGABRT) or get it killed instead of raising MemoryError.
+    if mem_limit and proc.exitcode is not None and proc.exitcode < 0:
+        return "memory", f"killed by signal {-proc.exitcode} under the memory limit"
+    return "crashed", f"exit code {proc.exitcode}"
+
+
+def run_forked(func, point, mem_limit=None):
+    """
+    func(point) in one forked process, like a single point of run_sweep but
+    blocking and not daemonic, so func may start process pools of its own.
+    Returns (status, result) with the statuses of run_sweep except timeout.
+    """
+    ctx = multiprocessing.get_context("fork")
+    reader, writer = ctx.Pipe(duplex=False)
+    proc = ctx.Process(target=_run_job, args=(writer, func, point, mem_limit))
+    proc.start()
+    writer.close()
+    try:
+        status, result = reader.recv()
+    except EOFError:
+        proc.join()
+        status, result = _crash_status(proc, mem_limit)
+    proc.join()
+    reader.close()
+    return status, result
+
+
+def run_sweep(func, points, workers=None, timeout=None, mem_limit=None, checkpoint=None, poll_interval=0.5,
+              benchmark=None):
+    """
+    Run func(point) for every point on up to `workers` processes.
+    Returns one record per point, in input order:
+    {"key", "benchmark", "point", "status", "result", "elapsed"} with
+    status one of ok / error / timeout / memory / crashed. benchmark names
+    the results in the checkpoint, so a file shared by several benchmarks
+    only resumes the points of this one.
+    """
+    workers = workers or os.cpu_count()
+    ctx = multiprocessing.get_context("fork")
+    done = load_checkpoint(checkpoint, benchmark)
+    pending = [p for p in points if point_key(p, benchmark) not in done]
+    if len(pending) < len(points):
+        print(f"[sweep] resuming: {len(points) - len(pending)} of {len(points)} points already done")
+
+    running = {}
+    while pending or running:
+        while pending and len(running) < workers:
+            point = pending.pop(0)
+            reader, writer = ctx.Pipe(duplex=False)
+            proc = ctx.Process(target=_run_job, args=(writer, func, point, mem_limit), daemon=True)
+            proc.start()
+            writer.close()
+            running[proc] = (point, reader, time.monotonic())
+
+        wait([reader for _, reader, _ in running.values()] + [p.sentinel for p in running], timeout=poll_interval)
+        now = time.monotonic()
+        for proc, (point, reader, start) in list(running.items()):
+            if reader.poll():
+                try:
+                    status, result = reader.recv()
+                    proc.join()
+                except EOFError:
+                    proc.join()
+                    status, result = _crash_status(proc, mem_limit)
+            elif not proc.is_alive():
+                proc.join()
+                status, result = _crash_status(proc, mem_limit)
+            elif timeout and now - start > timeout:
+                proc.kill()
+                proc.join()
+                status, result = "timeout", f"exceeded {timeout}s"
+            else:
+                continue
+            reader.close()
+            del running[proc]
+            record = {"key": point_key(point, benchmark), "benchmark": benchmark, "point": point, "status": status,
+                      "result": result, "elapsed": now - start}
+            done[record["key"]] = record
+            if checkpoint:
+                _append_checkpoint(checkpoint, record)
+
+    return [done[point_key(p, benchmark)] for p in points]
+
+
+def sweep_benchmark(benchmark, parameter_sets, **kwargs):
+    # Adapts the benchmark_* functions (list of (n, q, m) -> list of dicts)
+    # to run_sweep; points that did not finish become failure records.
+    results = []
+    for record in run_sweep(lambda point: benchmark([tuple(point)])[0], parameter_sets,
+                            benchmark=benchmark_name(benchmark), **kwargs):
+        if record["status"] == "ok":
+            results.append(record["result"])
+        else:
+            n, q, m = record["point"]
+            results.append({"n": n, "q": q, "m": m, "success": False,
+                            "error": f"{record['status']}: {record['result']}",
+                            "time_sec": record["elapsed"], "total_time": record["elapsed"]})
+    return results
+
+
+def add_sweep_arguments(parser):
+    parser.add_argument("--jobs", type=int, default=1, help="parallel worker processes")
+    parser.add_argument("--timeout", type=float, help="wall-clock limit per point, seconds")
+    parser.add_argument("--mem-limit", type=int,
+                        help="address-space limit per point, MiB; covers the whole forked process, "
+                             "including the Sage libraries already mapped")
+    parser.add_argument("--checkpoint", help="JSON-lines file to record finished points and resume from")
+
+
+def sweep_options(args):
+    return {
+        "workers": args.jobs,
+        "timeout": args.timeout,
+        "mem_limit": args.mem_limit << 20 if args.mem_limit else None,
+        "checkpoint": args.checkpoint,
+    }
@@ -0,0 +1,29 @@
+import pytest
+
+from dfr import parameter_sets, run_batch, wilson_interval
+
+
+def test_wilson_interval_known_value():
+    lo, hi = wilson_interval(50, 100)
+    assert lo == pytest.approx(0.4038, abs=1e-4)
+    assert hi == pytest.approx(0.5962, abs=1e-4)
+
+
+def test_wilson_interval_edges():
+    assert wilson_interval(0, 0) == (0.0, 1.0)
+    lo, hi = wilson_interval(0, 1000)
+    assert lo == 0.0 and 0 < hi < 0.01
+    lo, hi = wilson_interval(1000, 1000)
+    assert hi == 1.0 and 0.99 < lo < 1
+    assert wilson_interval(5, 100, 0.99)[0] < wilson_interval(5, 100, 0.9)[0]
+
+
+@pytest.mark.parametrize("name", sorted(parameter_sets()))
+def test_run_batch(name):
+    params = parameter_sets()[name]
+    result = run_batch(params, 16)
+    assert result["trials"] == 16
+    assert result["symbols"] == 16 * params["nbar"] ** 2
+    assert 0 <= result["failures"] <= 16
+    assert result["symbol_failures"] >= result["failures"]
+    assert result["max_noise"] <= params["q"] // 2
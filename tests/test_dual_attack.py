@@ -0,0 +1,70 @@
+import math
+
+import numpy as np
+import pytest
+
+from dual_attack import harvest, scores, distinguish, guess_block
+
+Q = 12289
+
+
+def instance(n=10, k=8, m=120, cols=4, seed=0):
+    # A = [A_R | A_G] with A_R = [I; C] for a ternary C, so the rows
+    # [-C_j | e_j] are short vectors of the dual of A_R, and LWE columns
+    # B = A S + E with ternary S and E.
+    rng = np.random.default_rng(seed)
+    C = rng.integers(-1, 2, size=(m - k, k))
+    A_R = np.vstack([np.eye(k, dtype=np.int64), C])
+    A_G = rng.integers(0, Q, size=(m, n - k))
+    A = np.hstack([A_R, A_G]) % Q
+    S = rng.integers(-1, 2, size=(n, cols))
+    E = rng.integers(-1, 2, size=(m, cols))
+    B = (A @ S + E) % Q
+    dual = np.hstack([-C, np.eye(m - k, dtype=np.int64)])
+    return A, B, S, dual
+
+
+def test_harvest_keeps_short_distinct_dual_vectors():
+    A, _, _, dual = instance()
+    k = 8
+    long_row = np.zeros(dual.shape[1], dtype=np.int64)
+    long_row[0] = Q
+    W = harvest(np.vstack([dual, long_row]), Q, count=400)
+    assert 0 < len(W) <= 400
+    norms = np.linalg.norm(W, axis=1)
+    assert norms.max() < Q
+    assert np.all(np.diff(norms) >= 0)
+    # Still in the dual of A_R.
+    assert not np.any((W @ A[:, :k]) % Q)
+    # One of w and -w, the one whose first nonzero entry is positive.
+    first = W[np.arange(len(W)), np.argmax(W != 0, axis=1)]
+    assert np.all(first > 0)
+    assert len({tuple(w) for w in W}) == len(W)
+
+
+def test_scores_tell_lwe_from_uniform():
+    A, B, S, dual = instance()
+    k = 8
+    W = harvest(dual, Q)
+    # Remove the guessed columns' contribution so B is LWE for A_R.
+    B_R = (B - A[:, k:] @ S[k:]) % Q
+    U = np.random.default_rng(1).integers(0, Q, size=B.shape)
+    assert np.all(scores(W, B_R, Q) > 0.9)
+    assert np.all(np.abs(scores(W, U, Q)) < 4 * math.sqrt(0.5 / len(W)))
+    assert distinguish(W, B_R, Q).all()
+    assert not distinguish(W, U, Q).any()
+    assert scores(W, B_R[:, 0], Q) == pytest.approx(scores(W, B_R, Q)[0])
+
+
+def test_guess_block_finds_the_secret_coordinates():
+    A, B, S, dual = instance()
+    block = [8, 9]
+    W = harvest(dual, Q)
+    guesses, best = guess_block(A, B, Q, W, block, range(-1, 2))
+    assert np.array_equal(guesses, S[block])
+    assert np.all(best > 0.9)
+    # A wrong guess of the block scores like uniform.
+    wrong = S[block].copy()
+    wrong[0] = (wrong[0] + 2) % 3 - 1
+    shifted = (B - A[:, block] @ wrong) % Q
+    assert np.all(np.abs(scores(W, shifted, Q)) < 4 * math.sqrt(0.5 / len(W)))
@@ -0,0 +1,61 @@
+import pytest
+
+import FrodoKEM
+import FrodoKEM_attack
+import attack_FrodoKEM_primal
+
+MODULES = [FrodoKEM, FrodoKEM_attack, attack_FrodoKEM_primal]
+
+
+@pytest.mark.parametrize("mod", MODULES, ids=lambda mod: mod.__name__)
+def test_batch_round_trip(mod):
+    pk, sk = mod.frodokem_keygen(engine="numpy")
+    results = mod.frodokem_encapsulate_batch(pk, 5, engine="numpy")
+    assert len(results) == 5
+    decapsulated = mod.frodokem_decapsulate_batch(pk, sk, [ct for ct, _, _ in results], engine="numpy")
+    for (ct, ss, message), (recovered, ss_rec) in zip(results, decapsulated):
+        assert recovered == message
+        assert ss_rec == ss
+        assert mod.frodokem_decapsulate(pk, sk, ct, engine="numpy") == (recovered, ss_rec)
+
+
+@pytest.mark.parametrize("mod", MODULES, ids=lambda mod: mod.__name__)
+def test_empty_batches(mod):
+    pk, sk = mod.frodokem_keygen(engine="numpy")
+    assert mod.frodokem_encapsulate_batch(pk, 0, engine="numpy") == []
+    assert mod.frodokem_decapsulate_batch(pk, sk, [], engine="numpy") == []
+
+
+def test_batch_messages():
+    mod = attack_FrodoKEM_primal
+    pk, sk = mod.frodokem_keygen(engine="numpy")
+    messages = [b"hello", b"", b"x" * mod.message_bytes]
+    results = mod.frodokem_encapsulate_batch(pk, len(messages), messages, engine="numpy")
+    decapsulated = mod.frodokem_decapsulate_batch(pk, sk, [ct for ct, _, _ in results], engine="numpy")
+    assert [m.rstrip(b"\x00") for m, _ in decapsulated] == messages
+    with pytest.raises(ValueError):
+        mod.frodokem_encapsulate_batch(pk, 2, messages, engine="numpy")
+
+
+def test_check_key():
+    mod = attack_FrodoKEM_primal
+    pk, sk = mod.frodokem_keygen(engine="numpy")
+    mod.check_key(pk, sk)
+    wrong = sk.copy()
+    wrong[0, 3] += 1
+    with pytest.raises(ValueError, match="column"):
+        mod.check_key(pk, wrong)
+
+
+def test_recovered_key_not_stored_unless_valid(tmp_path, monkeypatch):
+    from key_store import KeyStore
+    mod = attack_FrodoKEM_primal
+    store = KeyStore(str(tmp_path))
+    pk, sk = mod.frodokem_keygen(engine="numpy")
+    monkeypatch.setattr(mod, "crack_key", lambda pk, **options: sk + 1)
+    with pytest.raises(ValueError):
+        mod.recovered_key(pk, store, engine="numpy")
+    assert pk not in store
+    monkeypatch.setattr(mod, "crack_key", lambda pk, **options: sk)
+    assert (mod.recovered_key(pk, store, engine="numpy") == sk % mod.q).all()
+    assert pk in store
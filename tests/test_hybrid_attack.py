@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+
+from hybrid_attack import guesses, _init_worker, _test_chunk
+
+Q = 12289
+BOUND = 1
+
+
+def instance(n, k, m=120, cols=3, seed=0):
+    # A = [A_R | A_G] with A_R = [I; C] for a ternary C; the q-ary lattice of
+    # A_R then has the short basis [I | C^T] on top of [0 | qI]. Columns of
+    # B are LWE samples with ternary secrets and errors.
+    rng = np.random.default_rng(seed)
+    r = n - k
+    C = rng.integers(-1, 2, size=(m - r, r))
+    A_R = np.vstack([np.eye(r, dtype=np.int64), C])
+    A_G = rng.integers(0, Q, size=(m, k))
+    S = rng.integers(-1, 2, size=(n, cols))
+    E = rng.integers(-BOUND, BOUND + 1, size=(m, cols))
+    B = (np.hstack([A_R, A_G]) @ S + E) % Q
+    basis = np.block([[np.eye(r, dtype=np.int64), C.T],
+                      [np.zeros((m - r, r), dtype=np.int64), Q * np.eye(m - r, dtype=np.int64)]])
+    _init_worker(basis, A_R, A_G, Q, BOUND, (-1, 1))
+    return B, S
+
+
+def test_guesses_are_ordered_by_norm():
+    G = guesses(range(-1, 2), 2)
+    assert G.shape == (9, 2)
+    assert G[0].tolist() == [0, 0]
+    assert np.all(np.diff((G * G).sum(axis=1)) >= 0)
+    assert {tuple(g) for g in G} == {(a, b) for a in range(-1, 2) for b in range(-1, 2)}
+
+
+def test_guessing_no_coordinates():
+    G = guesses(range(-1, 2), 0)
+    assert G.shape == (1, 0)
+    B, S = instance(10, 0)
+    hits = _test_chunk(B, G)
+    assert hits == {j: S[:, j].tolist() for j in range(B.shape[1])}
+
+
+@pytest.mark.parametrize("k", [1, 2])
+def test_only_the_right_guess_verifies(k):
+    B, S = instance(10, k)
+    G = guesses(range(-1, 2), k)
+    hits = _test_chunk(B, G)
+    assert hits == {j: S[:, j].tolist() for j in range(B.shape[1])}
+    # Without the right guesses, no column verifies.
+    right = {tuple(S[10 - k:, j]) for j in range(B.shape[1])}
+    wrong = np.array([g for g in G if tuple(g) not in right]).reshape(-1, k)
+    assert _test_chunk(B, wrong) == {}
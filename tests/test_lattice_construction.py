@@ -0,0 +1,47 @@
+import random
+
+import pytest
+
+sage = pytest.importorskip("sage.all")
+
+from lattice_construction import qary_basis, dual_basis
+
+
+def instance(n, m, q, seed=0):
+    rng = random.Random(seed)
+    return [[rng.randrange(q) for _ in range(n)] for _ in range(m)]
+
+
+def generated_lattice(A, q):
+    # HNF of the generating set [A^T ; q I] of {A x mod q}.
+    m, n = len(A), len(A[0])
+    G = sage.Matrix(sage.ZZ, [[A[j][i] for j in range(m)] for i in range(n)]).stack(q * sage.identity_matrix(sage.ZZ, m))
+    H = G.echelon_form()
+    return H.matrix_from_rows([i for i in range(H.nrows()) if not H[i].is_zero()])
+
+
+@pytest.mark.parametrize("q", [2 ** 15, 65537])
+def test_qary_basis_spans_the_qary_lattice(q):
+    A = instance(6, 14, q)
+    B = qary_basis(A, q)
+    assert B.nrows() == B.ncols() == 14
+    assert abs(B.det()) == q ** (14 - 6)
+    assert B.echelon_form() == generated_lattice(A, q)
+
+
+@pytest.mark.parametrize("q", [2 ** 15, 65537])
+def test_dual_basis(q):
+    A = instance(6, 14, q, seed=1)
+    D = dual_basis(A, q)
+    assert D.nrows() == D.ncols() == 14
+    assert abs(D.det()) == q ** 6
+    assert all(x % q == 0 for x in (D * sage.Matrix(sage.ZZ, A)).list())
+
+
+def test_singular_block_falls_back_to_hnf():
+    q = 2 ** 15
+    # Even first column: no invertible n x n block modulo 2.
+    A = [[2 * a, b] for a, b in instance(2, 8, q, seed=2)]
+    assert qary_basis(A, q).echelon_form() == generated_lattice(A, q)
+    D = dual_basis(A, q)
+    assert all(x % q == 0 for x in (D * sage.Matrix(sage.ZZ, A)).list())
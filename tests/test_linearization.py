@@ -0,0 +1,73 @@
+import random
+from math import comb
+
+import numpy as np
+import pytest
+
+from linearization import build_system, error_polynomial, monomials, monomial_index
+
+
+def evaluate_monomials(x, n, degree, q):
+    values = []
+    for mono in monomials(n, degree):
+        v = 1
+        for xi, e in zip(x, mono):
+            v = v * pow(xi, e, q) % q
+        values.append(v)
+    return values
+
+
+def direct(q, A, b, E, x):
+    # P(b_i - <a_i, x>) for every sample.
+    out = []
+    for a, bi in zip(A, b):
+        t = (bi - sum(ai * xi for ai, xi in zip(a, x))) % q
+        v = 1
+        for e in E:
+            v = v * (t - e) % q
+        out.append(v)
+    return out
+
+
+@pytest.mark.parametrize("n,E", [(3, [-1, 0, 1]), (4, [-1, 0, 1]), (3, [-2, -1, 0, 1, 2]), (2, [0, 3])])
+def test_build_system_matches_direct_evaluation(n, E):
+    q = 65537
+    rng = random.Random(n * 10 + len(E))
+    m = 12
+    A = [[rng.randrange(q) for _ in range(n)] for _ in range(m)]
+    b = [rng.randrange(q) for _ in range(m)]
+    M = build_system(q, A, b, E)
+    assert M.shape == (m, comb(n + len(E), len(E)))
+    for _ in range(3):
+        x = [rng.randrange(q) for _ in range(n)]
+        lhs = [int(v) for v in M.astype(object) @ np.array(evaluate_monomials(x, n, len(E), q), dtype=object) % q]
+        assert lhs == direct(q, A, b, E, x)
+
+
+def test_secret_satisfies_every_equation():
+    q, n, E = 65537, 4, [-1, 0, 1]
+    rng = random.Random(5)
+    s = [rng.randrange(q) for _ in range(n)]
+    A = [[rng.randrange(q) for _ in range(n)] for _ in range(20)]
+    b = [(sum(a * x for a, x in zip(row, s)) + rng.choice(E)) % q for row in A]
+    M = build_system(q, A, b, E).astype(object)
+    assert not np.any(M @ np.array(evaluate_monomials(s, n, len(E), q), dtype=object) % q)
+
+
+def test_monomial_order():
+    monos = monomials(3, 2)
+    assert monos[0] == (0, 0, 0)
+    assert monos[1:4] == [(1, 0, 0), (0, 1, 0), (0, 0, 1)]
+    assert len(monos) == comb(5, 2) == len(monomial_index(3, 2))
+
+
+def test_error_polynomial():
+    E = [-1, 0, 2]
+    c = error_polynomial(E)
+    for t in range(-3, 4):
+        assert sum(ck * t ** k for k, ck in enumerate(c)) == (t + 1) * t * (t - 2)
+
+
+def test_large_modulus_rejected():
+    with pytest.raises(ValueError):
+        build_system(2 ** 31, [[1]], [1], [0, 1])
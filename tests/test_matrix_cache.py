@@ -0,0 +1,88 @@
+import numpy as np
+import pytest
+
+from matrix_cache import MatrixCache
+
+
+def matrix(value, entries=16):
+    return np.full((1, entries), value, dtype=np.int64)
+
+
+def test_lru_eviction_by_entries():
+    cache = MatrixCache(max_entries=2)
+    cache.put("a", matrix(1))
+    cache.put("b", matrix(2))
+    assert cache.get("a") is not None  # "b" is now least recently used
+    cache.put("c", matrix(3))
+    assert cache.get("b") is None
+    assert cache.get("a")[0, 0] == 1
+    assert cache.get("c")[0, 0] == 3
+    assert len(cache) == 2
+
+
+def test_eviction_by_bytes():
+    cache = MatrixCache(max_entries=10, max_bytes=3 * 128)
+    for key in "abc":
+        cache.put(key, matrix(0))
+    assert cache.stats()["bytes"] == 3 * 128
+    cache.put("d", matrix(0))
+    assert cache.get("a") is None
+    assert [cache.get(key) is not None for key in "bcd"] == [True] * 3
+    # Larger than the whole budget: returned but not kept.
+    big = cache.put("e", matrix(0, entries=64))
+    assert big.shape == (1, 64)
+    assert cache.get("e") is None
+    assert len(cache) == 3
+    cache.configure(max_bytes=128)
+    assert len(cache) == 1
+    assert cache.get("d") is not None
+
+
+def test_replacing_a_key_updates_the_byte_count():
+    cache = MatrixCache()
+    cache.put("a", matrix(0))
+    cache.put("a", matrix(0, entries=32))
+    assert cache.stats()["bytes"] == 256
+    assert len(cache) == 1
+
+
+def test_hit_and_miss_counters():
+    cache = MatrixCache()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return matrix(7)
+
+    first = cache.get_or_compute("k", compute)
+    second = cache.get_or_compute("k", compute)
+    assert first is second
+    assert len(calls) == 1
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 1, 1)
+    cache.clear()
+    assert cache.stats()["hits"] == cache.stats()["misses"] == len(cache) == 0
+
+
+def test_cached_matrices_are_read_only():
+    cache = MatrixCache()
+    M = cache.get_or_compute("k", lambda: matrix(1))
+    assert not M.flags.writeable
+    with pytest.raises(ValueError):
+        M[0, 0] = 2
+    assert cache.get("k")[0, 0] == 1
+
+
+def test_disabled_cache():
+    cache = MatrixCache(max_entries=0)
+    M = cache.put("k", matrix(1))
+    assert not M.flags.writeable
+    assert cache.get("k") is None
+
+
+def test_generate_a_is_cached_and_read_only():
+    import attack_FrodoKEM_primal as mod
+    A = mod.generate_A(b"\x01" * mod.seed_bytes, "numpy")
+    assert mod.generate_A(b"\x01" * mod.seed_bytes, "numpy") is A
+    assert not A.flags.writeable
+    assert A.shape == (mod.m, mod.n)
@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+
+from modular_solver import NotInvertible, factor, prime_power, solve_lwe, solve_mod
+
+MODULI = [2 ** 15, 3 ** 7, 65537]
+
+
+def test_prime_power():
+    assert prime_power(2 ** 15) == (2, 15)
+    assert prime_power(3 ** 7) == (3, 7)
+    assert prime_power(65537) == (65537, 1)
+    with pytest.raises(ValueError):
+        prime_power(12)
+
+
+@pytest.mark.parametrize("q", MODULI)
+def test_factor_inverts_pivot_block(q):
+    rng = np.random.default_rng(q)
+    A = rng.integers(0, q, size=(30, 12))
+    rows, inverse = factor(A, q)
+    assert len(rows) == 12
+    assert np.array_equal(A[rows] @ inverse % q, np.eye(12, dtype=np.int64))
+
+
+@pytest.mark.parametrize("q", MODULI)
+def test_solve_mod_many_columns(q):
+    rng = np.random.default_rng(q + 1)
+    A = rng.integers(0, q, size=(40, 16))
+    X = rng.integers(0, q, size=(16, 5))
+    B = A @ X % q
+    # Column 3 is not in the image of A.
+    B[0, 3] = (B[0, 3] + 1) % q
+    Y, ok = solve_mod(A, B, q)
+    assert ok.tolist() == [True, True, True, False, True]
+    assert np.array_equal(Y[:, ok], X[:, ok])
+
+
+@pytest.mark.parametrize("q", MODULI)
+def test_solve_mod_single_vector(q):
+    rng = np.random.default_rng(q + 2)
+    A = rng.integers(0, q, size=(20, 8))
+    x = rng.integers(0, q, size=8)
+    y, ok = solve_mod(A, A @ x % q, q)
+    assert ok and np.array_equal(y, x)
+
+
+def test_rank_deficient_mod_p():
+    q = 2 ** 15
+    A = np.random.default_rng(0).integers(0, q, size=(10, 4))
+    A[:, 3] = 2 * A[:, 3] % q  # even column: rank 3 modulo 2
+    with pytest.raises(NotInvertible):
+        factor(A, q)
+
+
+def test_solve_lwe_with_known_errors():
+    q = 2 ** 15
+    rng = np.random.default_rng(4)
+    n, m = 10, 30
+    A = rng.integers(0, q, size=(m, n))
+    S = rng.integers(-1, 2, size=(n, 3))
+    E = rng.integers(-1, 2, size=(m, 3))
+    B = (A @ S + E) % q
+    errors = [E[:, j].tolist() for j in range(3)]
+    # Column 1 only knows the errors of some samples; column 2 gets a wrong error.
+    errors[1] = [e if i % 2 else None for i, e in enumerate(errors[1])]
+    errors[2] = [e + 1 if i == 0 else e for i, e in enumerate(errors[2])]
+    secrets = solve_lwe(A.tolist(), B.T.tolist(), q, errors)
+    assert secrets[0] == (S[:, 0] % q).tolist()
+    assert secrets[1] == (S[:, 1] % q).tolist()
+    assert secrets[2] is None
@@ -0,0 +1,69 @@
+from fractions import Fraction
+
+import numpy as np
+import pytest
+
+from nearest_plane import NearestPlane
+
+
+def naive_coefficients(basis, target):
+    # Textbook nearest plane with exact rational Gram-Schmidt.
+    B = [[Fraction(int(x)) for x in row] for row in basis]
+    G = []
+    for b in B:
+        v = list(b)
+        for g in G:
+            mu = sum(x * y for x, y in zip(b, g)) / sum(x * x for x in g)
+            v = [x - mu * y for x, y in zip(v, g)]
+        G.append(v)
+    t = [Fraction(int(x)) for x in target]
+    c = [0] * len(B)
+    for i in reversed(range(len(B))):
+        ci = round(sum(x * y for x, y in zip(t, G[i])) / sum(x * x for x in G[i]))
+        c[i] = ci
+        t = [x - ci * y for x, y in zip(t, B[i])]
+    return c
+
+
+def random_basis(k, seed):
+    rng = np.random.default_rng(seed)
+    while True:
+        B = rng.integers(-20, 21, size=(k, k))
+        if abs(np.linalg.det(B)) > 1:
+            return B
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_double_matches_exact_nearest_plane(seed):
+    B = random_basis(8, seed)
+    targets = np.random.default_rng(100 + seed).integers(-1000, 1001, size=(20, 8))
+    decoder = NearestPlane(B, precision="double")
+    C = decoder.coefficients(targets)
+    assert C.tolist() == [naive_coefficients(B, t) for t in targets]
+    assert np.array_equal(decoder.closest(targets), C @ B)
+    assert np.array_equal(decoder.errors(targets), targets - C @ B)
+
+
+def test_batch_matches_single_targets():
+    B = random_basis(6, 7)
+    targets = np.random.default_rng(8).integers(-500, 501, size=(10, 6))
+    decoder = NearestPlane(B)
+    assert decoder.precision == "double"
+    batch = decoder.closest(targets)
+    for t, row in zip(targets, batch):
+        assert np.array_equal(decoder.closest(t)[0], row)
+
+
+def test_recovers_small_errors():
+    # Targets close to a lattice point decode to that point for a reduced
+    # (here: orthogonal) basis.
+    B = np.diag([50, 60, 70, 80])
+    rng = np.random.default_rng(3)
+    points = rng.integers(-10, 11, size=(30, 4)) @ B
+    noise = rng.integers(-20, 21, size=(30, 4))
+    assert np.array_equal(NearestPlane(B).errors(points + noise), noise)
+
+
+def test_unknown_precision():
+    with pytest.raises(ValueError):
+        NearestPlane(np.eye(3, dtype=np.int64), precision="single")
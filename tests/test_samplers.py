@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+
+from samplers import BinomialSampler, UniformSampler, CDFSampler
+
+SAMPLERS = [BinomialSampler(1), BinomialSampler(6), UniformSampler(3), CDFSampler()]
+
+
+@pytest.mark.parametrize("sampler", SAMPLERS, ids=lambda s: f"{type(s).__name__}({s.bound})")
+def test_support_and_bound(sampler):
+    x = sampler.sample(20000)
+    assert x.dtype == np.int64
+    assert x.shape == (20000,)
+    assert np.abs(x).max() <= sampler.bound
+    assert abs(x.mean()) < 0.1
+
+
+@pytest.mark.parametrize("sampler", SAMPLERS, ids=lambda s: f"{type(s).__name__}({s.bound})")
+def test_seeded_streams_are_deterministic(sampler):
+    assert np.array_equal(sampler.sample(1000, b"seed"), sampler.sample(1000, b"seed"))
+    assert not np.array_equal(sampler.sample(1000, b"seed"), sampler.sample(1000, b"other"))
+
+
+def test_binomial_support():
+    values = set(BinomialSampler(2).sample(20000).tolist())
+    assert values == {-2, -1, 0, 1, 2}
+    with pytest.raises(ValueError):
+        BinomialSampler(0)
+    with pytest.raises(ValueError):
+        BinomialSampler(9)
+
+
+def test_uniform_support():
+    x = UniformSampler(3).sample(70000)
+    counts = np.bincount(x + 3)
+    assert len(counts) == 7
+    # Each value has probability 1/7; allow five standard deviations.
+    assert np.all(np.abs(counts - 10000) < 5 * np.sqrt(10000 * 6 / 7))
+
+
+def test_cdf_bound():
+    assert CDFSampler().bound == 12
+
+
+@pytest.mark.parametrize("sampler", SAMPLERS, ids=lambda s: f"{type(s).__name__}({s.bound})")
+def test_sigma_matches_samples(sampler):
+    x = sampler.sample(200000, b"sigma")
+    assert abs(x.std() - sampler.sigma) < 0.02 * sampler.sigma
+
+
+def test_sigma_values():
+    assert BinomialSampler(1).sigma == pytest.approx(0.5 ** 0.5)
+    assert UniformSampler(1).sigma == pytest.approx((2 / 3) ** 0.5)
+    assert CDFSampler([16383, 32767]).sigma == pytest.approx(0.5 ** 0.5)
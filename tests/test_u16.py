@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+
+from frodo_engine import get_engine, to_u16, u16_values
+
+
+def old_encoding(values):
+    # The per-entry int.to_bytes format to_u16 replaced.
+    return b"".join(int(x).to_bytes(2, "little") for x in values)
+
+
+class ListMatrix:
+    # The only part of a Sage matrix to_u16 uses.
+    def __init__(self, values):
+        self.values = list(values)
+
+    def list(self):
+        return self.values
+
+
+def test_matches_old_encoding():
+    rng = np.random.default_rng(0)
+    M = rng.integers(0, 2**16, size=(7, 5))
+    assert to_u16(M) == old_encoding(M.ravel())
+    assert to_u16(ListMatrix(M.ravel().tolist())) == old_encoding(M.ravel())
+
+
+def test_reduces_mod_q():
+    q = 2**15
+    M = np.array([[-1, 0, 5], [q, q + 3, -q - 1]])
+    expected = old_encoding(x % q for x in M.ravel())
+    assert to_u16(M, q) == expected
+    assert to_u16(ListMatrix(M.ravel().tolist()), q) == expected
+
+
+@pytest.mark.parametrize("value", [-1, 2**16])
+def test_out_of_range_entries(value):
+    with pytest.raises(OverflowError):
+        old_encoding([value])
+    with pytest.raises(OverflowError):
+        to_u16(np.array([[1, value]]))
+    with pytest.raises(OverflowError):
+        to_u16(ListMatrix([1, value]))
+
+
+def test_round_trip():
+    rng = np.random.default_rng(1)
+    M = rng.integers(0, 2**16, size=(6, 4))
+    buf = to_u16(M)
+    assert u16_values(buf, M.size) == M.ravel().tolist()
+    assert u16_values(memoryview(bytearray(buf)), M.size) == M.ravel().tolist()
+    assert np.array_equal(get_engine("numpy").from_u16(buf, 6, 4), M)
+    assert np.array_equal(get_engine("numpy").from_u16(buf, 6, 4, mask=2**15 - 1), M & (2**15 - 1))
+    # Only the first count values are read.
+    assert u16_values(buf + b"\xff\xff", 3) == M.ravel()[:3].tolist()
+
+
+def test_empty():
+    assert to_u16(np.zeros((0, 3), dtype=np.int64)) == b""
+    assert u16_values(b"", 0) == []
@@ -0,0 +1,47 @@
+import time
+from contextlib import contextmanager
+
+# Per-phase wall-clock accounting. Attack code wraps its stages in
+# `with phase("reduction"):`; the time is only recorded while a caller
+# (e.g. the benchmark runner) has a record_phases() block open.
+#
+# Work done in a process pool is timed in the worker by timed_call() and
+# added to the parent's record by merge(); such phases are summed over the
+# workers, so with several workers they can exceed the wall time.
+
+_active = []
+
+
+@contextmanager
+def phase(name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        if _active:
+            timings = _active[-1]
+            timings[name] = timings.get(name, 0.0) + time.perf_counter() - start
+
+
+@contextmanager
+def record_phases():
+    timings = {}
+    _active.append(timings)
+    try:
+        yield timings
+    finally:
+        _active.pop()
+
+
+def timed_call(func, *args):
+    # For pool workers: (func(*args), phase timings of the call).
+    with record_phases() as timings:
+        result = func(*args)
+    return result, timings
+
+
+def merge(timings):
+    # Add phase timings measured elsewhere to the open record, if any.
+    if _active:
+        for name, seconds in timings.items():
+            _active[-1][name] = _active[-1].get(name, 0.0) + seconds